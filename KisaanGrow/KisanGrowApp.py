@@ -2,13 +2,28 @@
 
 import streamlit as st
 import pandas as pd
-import gspread
 import json
-import openai
+import io
+import logging
+import re
 import time
-from google.oauth2.service_account import Credentials
+import functools
+import uuid
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
-import random
+
+import advice
+import allocator
+import archive
+import bulk
+import profiling
+import reconcile
+import schema
+import storage
+from texts import CSS, TEXT
+
+log = logging.getLogger("kisaangrow.app")
 
 
 # ===================== SESSION TIMEOUT =====================
@@ -33,8 +48,6 @@ st.set_page_config(page_title="KisaanGrow", page_icon="🌾", layout="wide", ini
 # =========================================================
 # LANGUAGE SYSTEM
 # =========================================================
-LANGUAGES = {"en": "English", "hi": "हिन्दी"}
-
 if "lang" not in st.session_state:
     st.session_state.lang = "en"
 
@@ -44,63 +57,6 @@ if "ai_lang" not in st.session_state:
 
 lang = st.session_state.lang
 
-# TRANSLATION DICTIONARY
-TEXT = {
-    "title": {"en": "Welcome to KisaanGrow", "hi": "किसानग्रो में आपका स्वागत है"},
-    "subtitle": {"en": "Smart slot booking. AI guidance. Simple payments.", "hi": "स्मार्ट स्लॉट बुकिंग, AI सलाह और आसान भुगतान."},
-    "home_line1": {
-        "en": "KisaanGrow helps farmers book sugarcane delivery slots easily and avoid long waiting hours.",
-        "hi": "किसानग्रो किसानों को गन्ने की डिलीवरी स्लॉट आसानी से बुक करने और लंबे इंतज़ार से बचने में मदद करता है।"
-    },
-    "home_line2": {
-        "en": "Get instant AI guidance and track your payments in one place.",
-        "hi": "तुरंत AI सलाह प्राप्त करें और अपने भुगतान एक ही जगह ट्रैक करें।"
-    },
-
-    # Login Cards
-    "farmer_login": {"en": "Farmer Login", "hi": "किसान लॉगिन"},
-    "corporate_login": {"en": "Corporate Login", "hi": "कॉपोरेट लॉगिन"},
-    "mobile": {"en": "Mobile Number", "hi": "मोबाइल नंबर"},
-    "password": {"en": "Password", "hi": "पासवर्ड"},
-    "login_btn": {"en": "Login", "hi": "लॉगिन करें"},
-    "login_success": {"en": "Login successful", "hi": "लॉगिन सफल"},
-    "login_error": {"en": "Invalid credentials", "hi": "गलत जानकारी"},
-
-    # Farmer Dashboard
-    "farmer_dashboard": {"en": "Farmer Dashboard", "hi": "किसान डैशबोर्ड"},
-    "book_slot": {"en": "Book a Slot", "hi": "स्लॉट बुक करें"},
-    "quantity": {"en": "Sugarcane quantity (tonnes)", "hi": "गन्ने की मात्रा (टन में)"},
-    "choose_date": {"en": "Choose slot date", "hi": "स्लॉट की तारीख चुनें"},
-    "choose_time": {"en": "Select time slot", "hi": "समय का स्लॉट चुनें"},
-    "book_btn": {"en": "Book Slot", "hi": "स्लॉट बुक करें"},
-    "slot_booked": {"en": "Slot booked!", "hi": "स्लॉट बुक हो गया!"},
-    "ai_tip": {"en": "AI Advice", "hi": "AI सलाह"},
-
-    # Corporate Dashboard
-    "corp_dashboard": {"en": "Corporate Dashboard", "hi": "कॉपोरेट डैशबोर्ड"},
-    "all_bookings": {"en": "All Bookings", "hi": "सभी बुकिंग"},
-    "no_slots": {"en": "No farmer bookings yet.", "hi": "अभी कोई किसान बुकिंग नहीं है."},
-
-    "farmer_reg": {"en": "Farmer Registration", "hi": "किसान पंजीकरण"},
-    "corp_reg": {"en": "Corporate Registration", "hi": "कॉपोरेट पंजीकरण"},
-    "full_name": {"en": "Full Name", "hi": "पूरा नाम"},
-    "aadhar": {"en": "Aadhar Number", "hi": "आधार नंबर"},
-    "village": {"en": "Village (optional)", "hi": "गाँव (ऐच्छिक)"},
-    "create_pwd": {"en": "Create Password", "hi": "पासवर्ड बनाएँ"},
-    "confirm_pwd": {"en": "Confirm Password", "hi": "पासवर्ड की पुष्टि करें"},
-    "reg_farmer_btn": {"en": "Register Farmer", "hi": "किसान पंजीकृत करें"},
-    "reg_success_farmer": {"en": "Farmer registered successfully!", "hi": "किसान सफलतापूर्वक पंजीकृत हो गया!"},
-    "emp_id": {"en": "Employee ID", "hi": "कर्मचारी आईडी"},
-    "role": {"en": "Role", "hi": "भूमिका"},
-    "reg_corp_btn": {"en": "Register Corporate User", "hi": "कॉपोरेट उपयोगकर्ता पंजीकृत करें"},
-    "reg_success_corp": {"en": "Corporate user registered successfully!", "hi": "कॉपोरेट उपयोगकर्ता सफलतापूर्वक पंजीकृत हुआ!"},
-    "slot_id": {"en": "Enter Slot ID to update payment", "hi": "भुगतान अपडेट करने के लिए स्लॉट आईडी दर्ज करें"},
-    "payment_status": {"en": "Payment status", "hi": "भुगतान स्थिति"},
-    "update_payment_btn": {"en": "Update Payment", "hi": "भुगतान अपडेट करें"},
-    "payment_updated": {"en": "Payment status updated", "hi": "भुगतान स्थिति अपडेट हो गई"},
-    "payment_failed": {"en": "Slot ID not found", "hi": "स्लॉट आईडी नहीं मिली"}
-}
-
 # Translation helper
 T = lambda key: TEXT[key][st.session_state.lang]
 
@@ -117,60 +73,222 @@ CARD_SHADOW = "0 4px 12px rgba(0,0,0,0.1)"
 # =========================================================
 
 
+# =========================================================
+# PROFILING
+# =========================================================
+# Reruns are timed when PROFILE_LOG is set (every session, appended as JSON
+# lines) or when an admin — a Corp_ID listed in PROFILING_ADMINS — switches
+# on the sidebar panel. Otherwise the timed helpers below cost next to nothing.
+PROFILE_HISTORY = 200  # records kept per session for the panel
+
+@st.cache_resource
+def _profile_log(path):
+    return profiling.JsonlLog(path)
+
+def get_profile_log():
+    path = st.secrets.get('PROFILE_LOG')
+    return _profile_log(path) if path else None
+
+def is_admin():
+    admins = st.secrets.get('PROFILING_ADMINS', [])
+    if isinstance(admins, str):
+        admins = admins.split(',')
+    return st.session_state.get('user') == 'corp' and st.session_state.get('emp') in {
+        storage.normalize_key(a) for a in admins if str(a).strip()
+    }
+
+def profiling_on():
+    return get_profile_log() is not None or (st.session_state.get('profiling', False) and is_admin())
+
+@contextmanager
+def profiled(label, kind="rerun"):
+    """Time the enclosed rerun and keep / log its record."""
+    if profiling.active() is not None or not profiling_on():
+        yield
+        return
+    profiling.start(label, kind)
+    try:
+        yield
+    finally:
+        record = profiling.finish(st.session_state.setdefault('profile_session', uuid.uuid4().hex[:8]))
+        st.session_state.setdefault('profile_records', deque(maxlen=PROFILE_HISTORY)).append(record)
+        log = get_profile_log()
+        if log is not None:
+            log.write(record)
+
+def timed_fragment(fn):
+    """A fragment body timed as a span of the full rerun, or as its own run when it reruns alone."""
+    name = fn.__name__.strip('_').removesuffix('_fragment')
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        if profiling.active() is not None:
+            with profiling.span('fragment:' + name):
+                return fn(*args, **kwargs)
+        with profiled(f"{st.session_state.get('page', 'Home')} / {name}", "fragment"):
+            return fn(*args, **kwargs)
+    return run
+
+def fragment(fn):
+    return st.fragment(timed_fragment(fn))
+
 # =========================================================
 # GOOGLE SHEETS
 # =========================================================
 @st.cache_resource
+@profiling.timed("get_gsheet_client")
 def get_gsheet_client():
+    import gspread
+    from google.oauth2.service_account import Credentials
     data = json.loads(st.secrets['GCP_SERVICE_ACCOUNT'])
     scopes = ['https://www.googleapis.com/auth/spreadsheets','https://www.googleapis.com/auth/drive']
     creds = Credentials.from_service_account_info(data, scopes=scopes)
     return gspread.authorize(creds)
 
-@st.cache_data(ttl=20)
-def read_sheet(name):
-    sh = get_gsheet_client().open_by_key(st.secrets['SHEET_ID'])
+@st.cache_resource
+@profiling.timed("get_store")
+def get_store():
+    use_sheets = st.secrets.get('SHEET_ID') and (
+        st.secrets.get('STORAGE_BACKEND') == 'sheets' or st.secrets.get('SHEETS_MIRROR', True)
+    )
+    return storage.open_store(st.secrets, get_gsheet_client() if use_sheets else None)
+
+# The store caches each sheet's DataFrame and patches it on our own writes, so
+# frames returned here are shared between sessions: filter/copy, never mutate.
+# They are typed by schema.py (parsed Date, categorical Time/Payment_Status,
+# normalized Mobile strings) and never include Password/Aadhar.
+# Pass columns= / rows= (row id ranges) to fetch and cache only what a page shows.
+# Returns None (after showing the error) when the store can't be read.
+@profiling.timed("read_sheet")
+def read_sheet(name, columns=None, rows=None):
     try:
-        ws = sh.worksheet(name)
-        return pd.DataFrame(ws.get_all_records())
-    except:
-        return pd.DataFrame()
+        return get_store().read(name, columns=columns, rows=rows)
+    except Exception as e:
+        # None, not an empty frame: "no rows" would be shown as "no bookings"
+        log.exception("Reading %s failed", name)
+        st.error(f"Could not load {name}: {e}")
+        return None
+
+@profiling.timed("query_sheet")
+def query_sheet(sheet, **kwargs):
+    """Filtered/sorted/paged read pushed down to the store; returns (page, total)."""
+    try:
+        return get_store().query(sheet, **kwargs)
+    except Exception as e:
+        # An empty result would read as "no bookings"; say the data could not be loaded
+        log.exception("Query on %s failed", sheet)
+        st.error(f"Could not load {sheet}: {e}")
+        return pd.DataFrame(), 0
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _filter_domain(sheet, column, version):
+    return get_store().distinct(sheet, column)
+
+@profiling.timed("filter_domain")
+def filter_domain(sheet, column):
+    """Distinct values for a filter dropdown, recomputed only after writes to the sheet."""
+    return _filter_domain(sheet, column, get_store().version(sheet))
 
+@profiling.timed("write_row")
 def write_row(sheet, row_dict):
-    sh = get_gsheet_client().open_by_key(st.secrets['SHEET_ID'])
+    get_store().append(sheet, [row_dict])
+
+@st.cache_resource(show_spinner=False)
+def get_allocator():
+    return allocator.open_allocator(get_store(), st.secrets)
+
+@st.cache_resource(show_spinner=False)
+def get_archive():
+    return archive.open_archive(st.secrets)
+
+@profiling.timed("update_rows")
+def update_rows(sheet, row_ids, column, value):
+    """Set one column on many rows in a single batched write."""
+    get_store().update(sheet, {row_id: {column: value} for row_id in row_ids})
+
+# Login / duplicate-check lookups: O(1) per call, rebuilt only after writes
+USER_KEYS = {
+    'Farmers': ('Mobile', storage.normalize_mobile),
+    'Corporates': ('Corp_ID', storage.normalize_key),
+}
+
+@st.cache_resource
+def user_index(sheet):
+    column, normalize = USER_KEYS[sheet]
+    return storage.KeyIndex(get_store(), sheet, column, normalize)
+
+@profiling.timed("find_user")
+def find_user(sheet, key):
+    """The user's record, or None if there is none. If the store can't be read,
+    says so and stops the run rather than answering "invalid credentials"."""
     try:
-        ws = sh.worksheet(sheet)
-    except:
-        ws = sh.add_worksheet(sheet, rows=500, cols=20)
-        ws.append_row(list(row_dict.keys()))
-    headers = sh.worksheet(sheet).row_values(1)
-    sh.worksheet(sheet).append_row([row_dict.get(h, '') for h in headers])
+        return user_index(sheet).get(key)
+    except Exception:
+        log.exception("Looking up %s failed", sheet)
+        st.error(T("service_unavailable"))
+        st.stop()
 
 # =========================================================
 # AI ADVICE — LANG AWARE
 # =========================================================
-from openai import OpenAI
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+# The client (and the openai package, ~0.4 s to import) is only built the
+# first time a session asks for advice
+@st.cache_resource
+def get_openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+
+@st.cache_resource
+def get_advice_cache():
+    return advice.open_cache(st.secrets)
 
+@st.cache_resource
+def get_advice_worker():
+    return advice.AdviceWorker(get_openai_client(), get_advice_cache())
+
+ADVICE_TIMEOUT = 8  # seconds before the static tip is shown instead
+
+@profiling.timed("ai_advice")
 def ai_advice(qty, days):
+    """Start (or join) advice generation for this bucket without waiting for it."""
     if not st.secrets.get("OPENAI_API_KEY"):
-        return T("ai_tip")
-
-    if st.session_state.ai_lang == "hi":
-        prompt = f"किसान के लिए {qty} टन गन्ने और {days} दिनों के आधार पर एक छोटी, सरल और उपयोगी सलाह दें।"
+        return advice.Job.finished(T("ai_tip"))
+    return get_advice_worker().request(qty, days, st.session_state.ai_lang)
+
+def ai_advice_card(qty, days):
+    job = ai_advice(qty, days)
+    pending = not job.done and job.elapsed() < ADVICE_TIMEOUT
+    # Poll only while the answer is streaming in; the rest of the page is not rerun
+    st.fragment(_advice_fragment, run_every=0.5 if pending else None)(qty, days, pending)
+
+@timed_fragment
+def _advice_fragment(qty, days, polling):
+    job = ai_advice(qty, days)
+    settled = True
+    if job.done and not job.error:
+        text = job.text
+    elif job.error or job.elapsed() >= ADVICE_TIMEOUT:
+        text = T("ai_fallback")
     else:
-        prompt = f"Give short, simple and useful advice for a farmer based on {qty} tonnes of sugarcane and {days} days."
+        text = (job.text or "…") + " ▌"
+        settled = False
+    card(T("ai_tip"), text, "🤖", color="#9C27B0")
+    if polling and settled:
+        st.rerun()  # one full rerun re-registers the fragment without polling
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=200,
-            temperature=0.3
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        return f"AI Error: {e}"
+# =========================================================
+# FLASH MESSAGES
+# =========================================================
+
+# Messages that must survive the full rerun after a write (a fragment's own output is redrawn)
+def flash(region, kind, message=None):
+    st.session_state.setdefault('flash_' + region, []).append((kind, message))
+
+def show_flash(region):
+    for kind, message in st.session_state.pop('flash_' + region, []):
+        if message is None:
+            getattr(st, kind)()
+        else:
+            getattr(st, kind)(message)
 
 # =========================================================
 # CARD COMPONENT
@@ -220,12 +338,11 @@ def page_home():
             m = st.text_input(T("mobile"))
             p = st.text_input(T("password"), type='password')
             if st.form_submit_button(T("login_btn")):
-                df = read_sheet('Farmers')
-                match = df[(df['Mobile'].astype(str)==m) & (df['Password']==p)]
-                if not match.empty:
+                match = find_user('Farmers', m)
+                if match and str(match['Password']) == p:
                     st.session_state.user='farmer'
-                    st.session_state.mobile=m
-                    st.session_state.name=match.iloc[0]['Name']
+                    st.session_state.mobile=storage.normalize_mobile(match['Mobile'])
+                    st.session_state.name=match['Name']
                     st.success(T("login_success"))
                     st.balloons()
                     st.session_state.page = "Farmer Dashboard"
@@ -242,12 +359,11 @@ def page_home():
             e = st.text_input("Employee ID")
             pw = st.text_input(T("password"), type='password')
             if st.form_submit_button(T("login_btn")):
-                df = read_sheet('Corporates')
-                match = df[(df['Corp_ID'].astype(str)==e) & (df['Password']==pw)]
-                if not match.empty:
+                match = find_user('Corporates', e)
+                if match and str(match['Password']) == pw:
                     st.session_state.user='corp'
-                    st.session_state.emp=e
-                    st.session_state.corp_name=match.iloc[0]['Name']
+                    st.session_state.emp=storage.normalize_key(match['Corp_ID'])
+                    st.session_state.corp_name=match['Name']
                     st.success(T("login_success"))
                     st.session_state.page = "Corporate Dashboard"
                     st.rerun()
@@ -264,6 +380,10 @@ def page_farmer_dashboard():
         st.session_state.page = "Home"
         st.rerun()
 
+    if 'name' not in st.session_state and 'mobile' in st.session_state:
+        farmer = find_user('Farmers', st.session_state.mobile)
+        if farmer:
+            st.session_state.name = farmer['Name']
     if 'name' in st.session_state:
         st.write(f"Welcome, {st.session_state.name}!")
 
@@ -272,26 +392,52 @@ def page_farmer_dashboard():
             st.session_state.pop(k, None)
         st.rerun()
 
-    # --- Slot Booking ---
+    # Each region below is a fragment: its widgets rerun only that region.
+    # Writes flash their message and do one full rerun so every region refreshes.
+    _booking_fragment()
+
+    st.markdown("---")
+    st.markdown("### 📋 Your Booked Slots")
+    _my_slots_fragment()
+
+@fragment
+def _booking_fragment():
+    show_flash('booking')
     card(T("book_slot"), "")
 
     qty = st.number_input(T("quantity"), min_value=0.0)
     date = st.date_input(T("choose_date"))
-    times = [f"{h}:00 - {h+2}:00" for h in range(0,24,2)]
-    t = st.selectbox(T("choose_time"), times)
+    date_str = date.strftime('%Y-%m-%d')
+    free = get_allocator().availability(date_str)
+    t = st.selectbox(T("choose_time"), allocator.WINDOWS)
+    if free[t] != float("inf"):
+        st.caption(f"{free[t]:g} {T('tonnes_free')}")
+    redirect = st.checkbox(T("auto_redirect"), value=True)
 
     if st.button(T("book_btn"), use_container_width=True):
-        write_row('Slots',{
-            'Date':date.strftime('%Y-%m-%d'),
-            'Time':t,
-            'Quantity':qty,
-            'Farmer_Mobile':st.session_state.mobile,
-            'Farmer_Name':st.session_state.name,
-            'Payment_Status':'pending'
-        })
-        st.success(T("slot_booked"))
-        st.balloons()
+        try:
+            booked = get_allocator().book({
+                'Date':date_str,
+                'Time':t,
+                'Quantity':qty,
+                'Farmer_Mobile':st.session_state.mobile,
+                'Farmer_Name':st.session_state.name,
+                'Payment_Status':'pending'
+            }, redirect=redirect)
+        except allocator.SlotFull as e:
+            options = ", ".join(f"{d} {w} ({left:g} t)" for d, w, left in e.suggestions) or "—"
+            st.error(f"{T('slot_full')} {options}")
+        else:
+            if (booked['Date'], booked['Time']) != (date_str, t):
+                flash('booking', 'info', f"{T('slot_moved')} {booked['Date']} {booked['Time']}")
+            flash('booking', 'success', T("slot_booked"))
+            flash('booking', 'balloons')
+            st.rerun()
 
+    _ai_panel_fragment(qty, (date - datetime.today().date()).days)
+
+@fragment
+def _ai_panel_fragment(qty, days):
     # --- AI Language Toggle ---
     st.markdown("#### AI Language")
     colAI1, colAI2 = st.columns(2)
@@ -303,40 +449,51 @@ def page_farmer_dashboard():
             st.session_state.ai_lang = "hi"
 
     st.markdown(f"<h3 style='text-align:center;'>🤖 {T('ai_tip')}</h3>", unsafe_allow_html=True)
-    days = (date - datetime.today().date()).days
-    card(T("ai_tip"), ai_advice(qty, days), "🤖", color="#9C27B0")
-
-    st.markdown("---")
-    st.markdown("### 📋 Your Booked Slots")
+    ai_advice_card(qty, days)
 
-    df_slots = read_sheet('Slots')
-    my_slots = df_slots[df_slots['Farmer_Mobile'].astype(str) == str(st.session_state.mobile)]
+@fragment
+def _my_slots_fragment():
+    df_slots = read_sheet('Slots', columns=['Date', 'Time', 'Quantity', 'Farmer_Mobile', 'Payment_Status'])
+    if df_slots is None:
+        return
+    with profiling.span("filter"):
+        my_slots = df_slots[df_slots['Farmer_Mobile'] == st.session_state.mobile]
 
     if my_slots.empty:
         st.info(T('no_slots'))
     else:
         filter_date = st.date_input("Filter by Date (optional)")
         if filter_date:
-            my_slots = my_slots[my_slots['Date'] == filter_date.strftime('%Y-%m-%d')]
+            with profiling.span("filter"):
+                my_slots = my_slots[my_slots['Date'] == pd.Timestamp(filter_date)]
 
         # Show only specific columns
         my_slots = my_slots[['Time', 'Quantity', 'Payment_Status']]
         st.dataframe(my_slots, use_container_width=True)
 
         st.markdown("### 💰 Check Payment Status")
-        slot_list = df_slots.loc[my_slots.index, 'Date'] + " | " + my_slots['Time'] + " | ID:" + my_slots.index.astype(str)
-        selected = st.selectbox("Select Slot", slot_list)
-
-        if selected:
-            try:
-                idx = int(selected.split('ID:')[-1].strip())
-                slot_row = my_slots.loc[idx]
-                pay = slot_row['Payment_Status'] if 'Payment_Status' in slot_row else 'unknown'
-                card("Payment Status", f"Current status: <b>{pay}</b>", "💰", color="#4CAF50")
-            except Exception:
-                st.warning("Unable to read slot details.")
-        else:
-            st.info("No slot selected.")
+        slot_list = (
+            schema.date_str(df_slots.loc[my_slots.index, 'Date']) + " | " + my_slots['Time'].astype(str)
+            + " | ID:" + my_slots.index.astype(str)
+        )
+        _payment_status_fragment(slot_list.tolist())
+
+@fragment
+def _payment_status_fragment(slot_list):
+    selected = st.selectbox("Select Slot", slot_list)
+
+    if selected:
+        try:
+            idx = int(selected.split('ID:')[-1].strip())
+            slot_row = read_sheet('Slots', columns=['Payment_Status'], rows=[(idx, idx)])
+            if slot_row is None:
+                return
+            pay = slot_row['Payment_Status'].iloc[0] if len(slot_row) else 'unknown'
+            card("Payment Status", f"Current status: <b>{pay}</b>", "💰", color="#4CAF50")
+        except Exception:
+            st.warning("Unable to read slot details.")
+    else:
+        st.info("No slot selected.")
 
 # =========================================================
 # PAGE: CORPORATE DASHBOARD
@@ -356,95 +513,236 @@ def page_corp_dashboard():
         st.rerun()
 
     # --- KPI Section ---
-    df = read_sheet('Slots')
-    total_tonnes = df['Quantity'].sum() if not df.empty else 0
-    unique_farmers = df['Farmer_Mobile'].nunique() if not df.empty else 0
+    # Precomputed per-date rollups: cost does not grow with booking history
+    rollup = get_store().rollup
+    today = datetime.today().date()
+    today_str = today.strftime("%Y-%m-%d")
+    today_kpis = rollup.totals(today_str)
 
     st.markdown("### 📊 Today's KPIs")
 
     # Banner summary with today's date
-    today_str = datetime.today().strftime("%Y-%m-%d")
     st.markdown(
         f"""
         <div style='background:#000000; padding:18px; border-radius:10px; margin-bottom:20px; color:white;'>
             <h4>Today's Date: <b>{today_str}</b></h4>
-            <h4>Today's Incoming Sugarcane: <b>{total_tonnes}</b> tonnes</h4>
-            <h4>Total Farmers Registered Today: <b>{unique_farmers}</b></h4>
+            <h4>Today's Incoming Sugarcane: <b>{today_kpis['tonnes']}</b> tonnes</h4>
+            <h4>Total Farmers Registered Today: <b>{today_kpis['farmers']}</b></h4>
+            <h4>Payments: <b>{today_kpis['paid']}</b> paid / <b>{today_kpis['pending']}</b> pending</h4>
         </div>
         """,
         unsafe_allow_html=True
     )
 
+    # Gauges and the bookings table are fragments: their widgets rerun only their own region
+    _kpi_fragment()
+    _bookings_fragment()
+    _reconcile_fragment()
+    _archive_fragment()
+    _bulk_fragment()
+
+@fragment
+def _kpi_fragment():
+    today = datetime.today().date()
+    kpi_range = st.date_input("KPI date range", (today, today), key="kpi_range") or (today,)
+    kpis = get_store().rollup.totals(kpi_range[0].strftime("%Y-%m-%d"), kpi_range[-1].strftime("%Y-%m-%d"))
+    total_tonnes = kpis['tonnes']
+    unique_farmers = kpis['farmers']
+
     # Gauge Charts
-    import plotly.graph_objects as go
-    colG1, colG2 = st.columns(2)
-
-    with colG1:
-        fig1 = go.Figure(go.Indicator(
-            mode="gauge+number",
-            value=total_tonnes,
-            title={'text': "Total Sugarcane (tonnes)"},
-            gauge={'axis': {'range': [0, max(10, total_tonnes + 5)]}}
-        ))
-        st.plotly_chart(fig1, use_container_width=True)
-
-    with colG2:
-        fig2 = go.Figure(go.Indicator(
-            mode="gauge+number",
-            value=unique_farmers,
-            title={'text': "Unique Farmers Booked"},
-            gauge={'axis': {'range': [0, max(5, unique_farmers + 1)]}}
-        ))
-        st.plotly_chart(fig2, use_container_width=True)
-
-    if df.empty:
+    with profiling.span("chart"):
+        import plotly.graph_objects as go
+        colG1, colG2 = st.columns(2)
+
+        with colG1:
+            fig1 = go.Figure(go.Indicator(
+                mode="gauge+number",
+                value=total_tonnes,
+                title={'text': "Total Sugarcane (tonnes)"},
+                gauge={'axis': {'range': [0, max(10, total_tonnes + 5)]}}
+            ))
+            st.plotly_chart(fig1, use_container_width=True)
+
+        with colG2:
+            fig2 = go.Figure(go.Indicator(
+                mode="gauge+number",
+                value=unique_farmers,
+                title={'text': "Unique Farmers Booked"},
+                gauge={'axis': {'range': [0, max(5, unique_farmers + 1)]}}
+            ))
+            st.plotly_chart(fig2, use_container_width=True)
+
+@fragment
+def _bookings_fragment():
+    show_flash('bookings')
+    # The Date dropdown's values are cached per store version and say whether there are any slots
+    dates = filter_domain('Slots', 'Date')
+    if not dates:
         card(T("no_slots"), "", "📭", color="#B71C1C")
     else:
         card(T("all_bookings"), "")
-        st.dataframe(df, use_container_width=True)
-        st.markdown("### 💰 Update Payment Status")
-        if not df.empty:
-            st.markdown("### 🔍 Filter Slots")
-
-            colF1, colF2, colF3 = st.columns(3)
-            with colF1:
-                filter_farmer = st.selectbox("Farmer", ["All"] + sorted(df['Farmer_Name'].unique().tolist()))
-            with colF2:
-                filter_time = st.selectbox("Slot", ["All"] + sorted(df['Time'].unique().tolist()))
-            with colF3:
-                filter_status = st.selectbox("Payment Status", ["All", "paid", "pending"])
-
-            df_filtered = df.copy()
-            if filter_farmer != "All":
-                df_filtered = df_filtered[df_filtered['Farmer_Name'] == filter_farmer]
-            if filter_status != "All":
-                df_filtered = df_filtered[df_filtered['Payment_Status'] == filter_status]
-            if filter_time != "All":
-                df_filtered = df_filtered[df_filtered['Time'] == filter_time]
-
-            slot_options = df_filtered.apply(lambda row: f"{row['Farmer_Name']} | {row['Time']} | Qty: {row['Quantity']} | Status: {row['Payment_Status']} | ID:{row.name}", axis=1)
-
-            selected_slot = st.selectbox("Select Slot to Update", slot_options)
-
-            if selected_slot:
-                try:
-                    chosen_id = int(selected_slot.split("ID:")[-1].strip())
-
-                    # Map pandas index to Google Sheets row (row 1 = header)
-                    sheet_row = chosen_id + 2
+        st.markdown("### 🔍 Filter Slots")
+
+        colF1, colF2, colF3, colF4 = st.columns(4)
+        with colF1:
+            filter_farmer = st.selectbox("Farmer", ["All"] + filter_domain('Slots', 'Farmer_Name'))
+        with colF2:
+            filter_time = st.selectbox("Slot", ["All"] + filter_domain('Slots', 'Time'))
+        with colF3:
+            filter_status = st.selectbox("Payment Status", ["All", "paid", "pending"])
+        with colF4:
+            filter_date = st.selectbox("Date", ["All"] + dates[::-1])
+
+        where = {col: value for col, value in [
+            ('Farmer_Name', filter_farmer), ('Time', filter_time),
+            ('Payment_Status', filter_status), ('Date', filter_date)
+        ] if value != "All"}
+
+        # Filtering, sorting and paging run in the data layer; only one page is loaded
+        colP1, colP2, colP3, colP4 = st.columns(4)
+        with colP1:
+            page_size = st.selectbox("Rows per page", [25, 50, 100, 200], key="bookings_page_size")
+        with colP2:
+            sort_by = st.selectbox("Sort by", ['Date', 'Time', 'Quantity', 'Farmer_Name', 'Payment_Status'], key="bookings_sort")
+        with colP3:
+            descending = st.checkbox("Descending", value=True, key="bookings_desc")
+        # One query returns the page and the filtered total; the page picker is drawn after it
+        page_no = int(st.session_state.get("bookings_page", 1))
+        page_df, total = query_sheet(
+            'Slots', where=where, order_by=sort_by, descending=descending,
+            limit=page_size, offset=(page_no - 1) * page_size
+        )
+        pages = max(1, -(-total // page_size))
+        if page_no > pages:  # the filter or page size changed under a later page
+            page_no = pages
+            page_df, total = query_sheet(
+                'Slots', where=where, order_by=sort_by, descending=descending,
+                limit=page_size, offset=(page_no - 1) * page_size
+            )
+            st.session_state["bookings_page"] = page_no
+        with colP4:
+            st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="bookings_page")
+        st.dataframe(page_df, use_container_width=True)
+        st.caption(f"{total} bookings")
 
-                    new_status = st.selectbox(T('payment_status'), ['paid', 'pending'], key="status_update")
+        st.markdown("### 💰 Update Payment Status")
+        # Options are the store's stable row ids; labels are built column-wise for this page only
+        slot_labels = (
+            page_df['Farmer_Name'].astype(str) + " | " + page_df['Time'].astype(str)
+            + " | Qty: " + page_df['Quantity'].astype(str) + " | Status: " + page_df['Payment_Status'].astype(str)
+            + " | ID:" + page_df.index.to_series().astype(str)
+        ) if not page_df.empty else pd.Series(dtype=str)
+
+        select_all = st.checkbox(f"Select all {total} filtered slots", key="select_all_slots")
+        if select_all:
+            selected_ids = list(query_sheet('Slots', where=where, columns=[])[0].index)
+            st.info(f"{len(selected_ids)} slots selected")
+        else:
+            selected_ids = st.multiselect(
+                "Select Slots to Update",
+                list(page_df.index),
+                format_func=lambda rid: slot_labels[rid],
+                key="slots_to_update"
+            )
 
-                    if st.button(T('update_payment_btn'), key="corp_status_btn"):
-                        sh = get_gsheet_client().open_by_key(st.secrets['SHEET_ID'])
-                        ws = sh.worksheet('Slots')
+        new_status = st.selectbox(T('payment_status'), ['paid', 'pending'], key="status_update")
 
-                        col_index = df.columns.get_loc('Payment_Status') + 1
-                        ws.update_cell(sheet_row, col_index, new_status)
+        if st.button(T('update_payment_btn'), key="corp_status_btn", disabled=not selected_ids):
+            try:
+                update_rows('Slots', selected_ids, 'Payment_Status', new_status)
+            except Exception as e:
+                st.error(f"Update failed: {e}")
+            else:
+                flash('bookings', 'success', f"{T('payment_updated')} ({len(selected_ids)})")
+                st.rerun()
+
+@fragment
+def _reconcile_fragment():
+    with st.expander("🏦 Reconcile bank statement"):
+        upload = st.file_uploader("Settlement CSV (mobile / UPI ID, date, amount)", type=["csv"], key="reconcile_file")
+        if upload is None:
+            return
+        upload.seek(0)  # the fragment reruns with the same upload
+        try:
+            matched, unmatched, ambiguous = reconcile.reconcile(get_store(), upload, st.secrets)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        st.write(f"**{len(matched)}** matched · **{len(ambiguous)}** ambiguous · **{len(unmatched)}** unmatched")
+        for title, df in [("Matched", matched), ("Ambiguous", ambiguous), ("Unmatched", unmatched)]:
+            if len(df):
+                st.markdown(f"#### {title}")
+                st.dataframe(df, use_container_width=True)
+        if len(matched) and st.button(f"Mark {len(matched)} slots paid", key="reconcile_apply"):
+            update_rows('Slots', list(matched['slot_id']), 'Payment_Status', 'paid')
+            flash('bookings', 'success', f"{T('payment_updated')} ({len(matched)})")
+            st.rerun()
 
-                        st.success(T('payment_updated'))
-                except Exception as e:
-                    st.error(f"Update failed: {e}")
+@fragment
+def _archive_fragment():
+    # Past seasons live in Parquet files and are only read when asked for
+    seasons = get_archive().partitions()
+    if not seasons:
+        return
+    with st.expander("📦 Archived seasons"):
+        colA1, colA2 = st.columns(2)
+        with colA1:
+            season = st.selectbox("Season", ["—"] + seasons[::-1], key="archive_season")
+        with colA2:
+            status = st.selectbox("Payment Status", ["All", "paid", "pending"], key="archive_status")
+        if season == "—":
+            return
+        df = get_archive().read(season)
+        if status != "All":
+            with profiling.span("filter"):
+                df = df[df['Payment_Status'] == status]
+        st.dataframe(df, use_container_width=True)
+        st.caption(f"{len(df)} bookings, {df['Quantity'].sum():g} tonnes")
+
+@fragment
+def _bulk_fragment():
+    with st.expander("📥 Bulk import"):
+        sheet = st.selectbox("Import into", list(bulk.COLUMNS), key="import_sheet")
+        st.caption("Columns: " + ", ".join(bulk.COLUMNS[sheet]))
+        upload = st.file_uploader("CSV or Parquet file", type=["csv", "parquet"], key="import_file")
+        if upload is not None and st.button("Import", key="import_btn"):
+            upload.seek(0)
+            try:
+                added, rejects = bulk.import_rows(get_store(), sheet, upload)
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.success(f"Imported {added} {sheet}, rejected {len(rejects)}")
+                if len(rejects):
+                    st.dataframe(rejects.head(200), use_container_width=True)
+                    st.download_button(
+                        "Download rejected rows", rejects.to_csv(index=False), f"{sheet}_rejected.csv",
+                        "text/csv", key="import_rejects"
+                    )
+
+    with st.expander("📤 Export bookings"):
+        colE1, colE2, colE3 = st.columns(3)
+        with colE1:
+            export_range = st.date_input("Dates", (), key="export_range")
+        with colE2:
+            export_status = st.selectbox("Payment Status", ["All", "paid", "pending"], key="export_status")
+        with colE3:
+            export_fmt = st.selectbox("Format", ["csv", "parquet"], key="export_fmt")
+        if st.button("Prepare export", key="export_btn"):
+            # Pages are encoded one at a time; only the finished file is held, never one big DataFrame
+            out = io.BytesIO()
+            rows = bulk.export_slots(
+                get_store(), out,
+                export_range[0].strftime('%Y-%m-%d') if export_range else None,
+                export_range[-1].strftime('%Y-%m-%d') if export_range else None,
+                None if export_status == "All" else export_status,
+                fmt=export_fmt, archive=get_archive(),
+            )
+            out.seek(0)
+            st.download_button(
+                f"Download {rows} bookings", out, f"slots.{export_fmt}",
+                "text/csv" if export_fmt == "csv" else "application/octet-stream", key="export_download"
+            )
 
 # =========================================================
 # PAGE: FARMER REGISTRATION
@@ -464,15 +762,16 @@ def page_farmer_registration():
         pwd2 = st.text_input(T('confirm_pwd'), type='password')
         submit = st.form_submit_button(T('reg_farmer_btn'))
         if submit:
-            import re
-            if not re.match(r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d).{8,}$', pwd):
+            if not re.match(bulk.PASSWORD_RULE, pwd):
                 st.error('Password must be 8+ chars with upper, lower and a number.')
             elif pwd != pwd2:
                 st.error('Passwords do not match.')
+            elif find_user('Farmers', mobile):
+                st.error(T('already_registered'))
             else:
                 write_row('Farmers', {
                     'Name': name,
-                    'Mobile': mobile,
+                    'Mobile': storage.normalize_mobile(mobile),
                     'Aadhar': aadhar,
                     'Village': village,
                     'Password': pwd
@@ -496,11 +795,12 @@ def page_corporate_registration():
         pwd2 = st.text_input(T('confirm_pwd'), type='password')
         submit = st.form_submit_button(T('reg_corp_btn'))
         if submit:
-            import re
-            if not re.match(r'^(?=.*[a-z])(?=.*[A-Z])(?=.*\d).{8,}$', pwd):
+            if not re.match(bulk.PASSWORD_RULE, pwd):
                 st.error('Password must be 8+ chars with upper, lower and a number.')
             elif pwd != pwd2:
                 st.error('Passwords do not match.')
+            elif find_user('Corporates', emp_id):
+                st.error(T('already_registered'))
             else:
                 write_row('Corporates', {
                     'Name': name,
@@ -525,23 +825,8 @@ with colB:
     if st.button("हिन्दी", key="lang_hi_btn"):
         st.session_state.lang = "hi"
 
-# Smooth UI transitions
-st.markdown(
-    """
-    <style>
-    * {
-        transition: all 0.25s ease-in-out;
-    }
-    div[data-testid="stSidebar"] * {
-        transition: all 0.25s ease-in-out;
-    }
-    button, select, input, textarea {
-        transition: background-color 0.25s ease, color 0.25s ease, border 0.25s ease;
-    }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+# Smooth UI transitions (re-emitted every rerun, or Streamlit drops it)
+st.markdown(CSS, unsafe_allow_html=True)
 
 page = st.session_state.get("page", st.sidebar.selectbox("Go to",[
     "Home",
@@ -551,11 +836,37 @@ page = st.session_state.get("page", st.sidebar.selectbox("Go to",[
     "Corporate Dashboard"
 ]))
 
-if page == "Home": page_home()
-elif page == "Farmer Registration": page_farmer_registration()
-elif page == "Corporate Registration": page_corporate_registration()
-elif page == "Farmer Dashboard": page_farmer_dashboard()
-elif page == "Corporate Dashboard": page_corp_dashboard()
+with profiled(page):
+    if page == "Home": page_home()
+    elif page == "Farmer Registration": page_farmer_registration()
+    elif page == "Corporate Registration": page_corporate_registration()
+    elif page == "Farmer Dashboard": page_farmer_dashboard()
+    elif page == "Corporate Dashboard": page_corp_dashboard()
+
+# Admin-only: spans of the last rerun and per-page averages for this session
+if is_admin():
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### ⏱️ Profiling")
+    st.sidebar.toggle("Time reruns", key="profiling")
+    records = list(st.session_state.get('profile_records', []))
+    if records:
+        last = records[-1]
+        st.sidebar.caption(f"Last {last['kind']}: {last['page']} — {last['ms']:.0f} ms")
+        st.sidebar.dataframe(
+            pd.DataFrame(
+                [(name, s['n'], s['ms']) for name, s in last['spans'].items()], columns=['span', 'calls', 'ms']
+            ).sort_values('ms', ascending=False),
+            hide_index=True, use_container_width=True
+        )
+        with st.sidebar.expander(f"Per page ({len(records)} reruns)"):
+            st.dataframe(
+                profiling.summarize(records)[['page', 'span', 'reruns', 'calls', 'mean_ms', 'p95_ms']],
+                hide_index=True, use_container_width=True
+            )
+        st.sidebar.download_button(
+            "Download JSONL", "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records),
+            "profile.jsonl", "application/jsonl", key="profile_download"
+        )
 
 st.sidebar.markdown("---")
 st.sidebar.write("KisaanGrow © Bilingual Version")
\ No newline at end of file
@@ -0,0 +1,246 @@
+# KisaanGrow AI advice — bucketed prompts behind a persistent LRU + TTL cache
+#
+# Advice depends only on (quantity bucket, days bucket, language), so every
+# dashboard rerun for the same situation is a cache hit instead of a model call.
+# Pre-warm the common buckets before the season with:
+#     python advice.py prewarm
+#
+# On a miss, AdviceWorker streams the answer on a thread pool so the dashboard
+# can render a placeholder and keep its widgets responsive meanwhile.
+
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MODEL = "gpt-4o-mini"
+REQUEST_TIMEOUT = 30
+
+# Lower edges of the buckets; a value falls into the largest edge <= it
+QTY_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500]
+DAYS_BUCKETS = [-10_000, 0, 1, 2, 4, 8, 15, 31]
+
+
+def _bucket(value, edges):
+    chosen = edges[0]
+    for edge in edges:
+        if value >= edge:
+            chosen = edge
+    return chosen
+
+
+def bucket_key(qty, days, lang):
+    return (_bucket(float(qty or 0), QTY_BUCKETS), _bucket(int(days or 0), DAYS_BUCKETS), lang)
+
+
+def _span(edge, edges):
+    i = edges.index(edge)
+    return edge, (edges[i + 1] - 1 if i + 1 < len(edges) else None)
+
+
+def build_prompt(qty_bucket, days_bucket, lang):
+    lo, hi = _span(qty_bucket, QTY_BUCKETS)
+    if lang == "hi":
+        qty = f"{lo}-{hi + 1} टन" if hi is not None else f"{lo}+ टन"
+        if days_bucket < 0:
+            when = "बीती तारीख की डिलीवरी"
+        elif days_bucket == 0:
+            when = "आज डिलीवरी"
+        else:
+            d_lo, d_hi = _span(days_bucket, DAYS_BUCKETS)
+            when = f"{d_lo}-{d_hi} दिनों में डिलीवरी" if d_hi is not None else f"{d_lo}+ दिनों में डिलीवरी"
+        return f"किसान के लिए {qty} गन्ने और {when} के आधार पर एक छोटी, सरल और उपयोगी सलाह दें।"
+    qty = f"{lo}-{hi + 1} tonnes" if hi is not None else f"{lo}+ tonnes"
+    if days_bucket < 0:
+        when = "a delivery date that has already passed"
+    elif days_bucket == 0:
+        when = "delivery today"
+    else:
+        d_lo, d_hi = _span(days_bucket, DAYS_BUCKETS)
+        when = f"delivery in {d_lo}-{d_hi} days" if d_hi is not None else f"delivery in {d_lo}+ days"
+    return f"Give short, simple and useful advice for a farmer based on {qty} of sugarcane and {when}."
+
+
+def generate(client, prompt):
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=200,
+        temperature=0.3,
+        timeout=REQUEST_TIMEOUT
+    )
+    return response.choices[0].message.content.strip()
+
+
+def stream(client, prompt):
+    response = client.chat.completions.create(
+        model=MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=200,
+        temperature=0.3,
+        timeout=REQUEST_TIMEOUT,
+        stream=True
+    )
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+# =========================================================
+# CACHE
+# =========================================================
+
+class AdviceCache:
+    """SQLite-backed cache, bounded to max_entries (least recently used go first)."""
+
+    def __init__(self, path, max_entries=5000, ttl=7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS advice "
+            "(qty REAL, days INTEGER, lang TEXT, text TEXT, created REAL, used REAL, "
+            "PRIMARY KEY (qty, days, lang))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_advice_used ON advice (used)")
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT text, created FROM advice WHERE qty = ? AND days = ? AND lang = ?", key
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE advice SET used = ? WHERE qty = ? AND days = ? AND lang = ?", (now,) + key)
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, text):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO advice VALUES (?, ?, ?, ?, ?, ?)", key + (text, now, now))
+            excess = self.conn.execute("SELECT COUNT(*) FROM advice").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM advice WHERE rowid IN (SELECT rowid FROM advice ORDER BY used LIMIT ?)", (excess,)
+                )
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM advice")
+
+
+def get_advice(client, cache, qty, days, lang):
+    key = bucket_key(qty, days, lang)
+    text = cache.get(key)
+    if text is None:
+        text = generate(client, build_prompt(*key))
+        cache.put(key, text)
+    return text
+
+
+# =========================================================
+# BACKGROUND WORKER
+# =========================================================
+
+class Job:
+    def __init__(self, text=""):
+        self.text = text
+        self.done = False
+        self.error = None
+        self.started = time.monotonic()
+
+    @classmethod
+    def finished(cls, text):
+        job = cls(text)
+        job.done = True
+        return job
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+class AdviceWorker:
+    """Generates advice on a thread pool; one in-flight job per bucket key.
+
+    A failed job is kept for retry_after seconds so reruns don't hammer a
+    failing API.
+    """
+
+    def __init__(self, client, cache, max_workers=4, retry_after=60):
+        self.client = client
+        self.cache = cache
+        self.retry_after = retry_after
+        self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix="kisaangrow-advice")
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def request(self, qty, days, lang):
+        key = bucket_key(qty, days, lang)
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and not self._expired(job):
+                return job
+        text = self.cache.get(key)
+        if text is not None:
+            return Job.finished(text)
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None or self._expired(job):
+                job = self.jobs[key] = Job()
+                self.pool.submit(self._run, key, job)
+            return job
+
+    def _run(self, key, job):
+        try:
+            for piece in stream(self.client, build_prompt(*key)):
+                job.text += piece
+            job.text = job.text.strip()
+            self.cache.put(key, job.text)
+            with self.lock:
+                self.jobs.pop(key, None)
+        except Exception as e:
+            job.error = e
+        finally:
+            job.done = True
+
+    def _expired(self, job):
+        return job.error is not None and job.elapsed() > self.retry_after
+
+
+def prewarm(client, cache, langs=("en", "hi"), force=False):
+    """Fill every (quantity, days, language) bucket; returns how many model calls were made."""
+    calls = 0
+    for lang in langs:
+        for qty in QTY_BUCKETS:
+            for days in DAYS_BUCKETS:
+                key = (qty, days, lang)
+                if force or cache.get(key) is None:
+                    cache.put(key, generate(client, build_prompt(*key)))
+                    calls += 1
+    return calls
+
+
+def open_cache(settings):
+    return AdviceCache(
+        settings.get("ADVICE_CACHE_PATH", "advice_cache.db"),
+        max_entries=int(settings.get("ADVICE_CACHE_SIZE", 5000)),
+        ttl=float(settings.get("ADVICE_CACHE_TTL", 7 * 24 * 3600)),
+    )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["prewarm"]:
+        sys.exit("usage: python advice.py prewarm [--force]")
+    from openai import OpenAI
+    from config import load_secrets
+    settings = load_secrets()
+    calls = prewarm(OpenAI(api_key=settings["OPENAI_API_KEY"]), open_cache(settings), force="--force" in sys.argv)
+    print(f"Pre-warmed {calls} advice buckets")
@@ -0,0 +1,95 @@
+# KisaanGrow slot allocator — caps booked tonnage per (date, time window) at the mill's crushing capacity
+#
+# Remaining capacity is a single rollup lookup, booking is an atomic
+# check-and-reserve (see SlotRollup.reserve), and a full window can be
+# redirected to the nearest one that still has room. book_many() books a batch
+# with a single store write (api.py).
+
+from datetime import datetime, timedelta
+
+# The twelve two-hour gate windows offered to farmers
+WINDOWS = [f"{h}:00 - {h+2}:00" for h in range(0, 24, 2)]
+
+
+class SlotFull(Exception):
+    def __init__(self, date, slot, remaining, suggestions):
+        super().__init__(f"{date} {slot} has only {remaining:g} tonnes left")
+        self.date = date
+        self.slot = slot
+        self.remaining = remaining
+        self.suggestions = suggestions
+
+
+class SlotAllocator:
+    """capacity is tonnes per window (0 = unlimited); overrides maps window -> tonnes."""
+
+    def __init__(self, store, capacity=100.0, overrides=None):
+        self.store = store
+        self.rollup = store.rollup
+        self.default_capacity = float(capacity)
+        self.overrides = {k: float(v) for k, v in (overrides or {}).items()}
+
+    def capacity(self, slot):
+        cap = self.overrides.get(slot, self.default_capacity)
+        return cap if cap > 0 else float("inf")
+
+    def remaining(self, date, slot):
+        return max(0.0, self.capacity(slot) - self.rollup.tonnes(date, slot))
+
+    def availability(self, date):
+        booked = self.rollup.by_window(date)
+        return {w: max(0.0, self.capacity(w) - booked.get(w, {}).get("tonnes", 0.0)) for w in WINDOWS}
+
+    def suggest(self, date, slot, qty, limit=3, days_ahead=2):
+        """Nearest windows (same day first, then following days) that can take qty tonnes."""
+        start = WINDOWS.index(slot) if slot in WINDOWS else 0
+        day = datetime.strptime(date, "%Y-%m-%d").date()
+        order = sorted(range(len(WINDOWS)), key=lambda i: (abs(i - start), i))
+        found = []
+        for offset in range(days_ahead + 1):
+            d = (day + timedelta(days=offset)).strftime("%Y-%m-%d")
+            free = self.availability(d)
+            for i in order:
+                w = WINDOWS[i]
+                if (d, w) != (date, slot) and free[w] >= qty:
+                    found.append((d, w, free[w]))
+                    if len(found) == limit:
+                        return found
+        return found
+
+    def book(self, row, redirect=False):
+        """Book row (a Slots dict); returns the booked row, moved if redirect found a free window."""
+        return self._place(row, self.store.book(row, self.capacity), redirect)[0]
+
+    def book_many(self, rows, redirect=False):
+        """Book a batch with one store write. Per row: (booked row, row id), or the SlotFull book() would raise.
+
+        Rows that do not fit are redirected (when asked) one at a time, as in book()."""
+        results = []
+        for row, row_id in zip(rows, self.store.book_many(rows, self.capacity)):
+            try:
+                results.append(self._place(row, row_id, redirect))
+            except SlotFull as e:
+                results.append(e)
+        return results
+
+    def _place(self, row, row_id, redirect):
+        if row_id is not None:
+            return row, row_id
+        qty = float(row.get("Quantity") or 0)
+        suggestions = self.suggest(row["Date"], row["Time"], qty)
+        if redirect:
+            for d, w, _ in suggestions:
+                moved = dict(row, Date=d, Time=w)
+                row_id = self.store.book(moved, self.capacity)
+                if row_id is not None:
+                    return moved, row_id
+        raise SlotFull(row["Date"], row["Time"], self.remaining(row["Date"], row["Time"]), suggestions)
+
+
+def open_allocator(store, settings):
+    return SlotAllocator(
+        store,
+        capacity=settings.get("MILL_CAPACITY", 100),
+        overrides=settings.get("MILL_CAPACITY_BY_WINDOW"),
+    )
@@ -0,0 +1,304 @@
+# KisaanGrow booking API — JSON over HTTP for partner channels (IVR, SMS gateways, kiosks)
+#
+# Runs next to the Streamlit app on the same store (storage.open_store) and the
+# same capacity rules (allocator), without a script rerun per action:
+#     python api.py --port 8080
+#
+#     POST /login           {"mobile": "...", "password": "..."}        -> {"token": ..., "name": ...}
+#     POST /book-slot       {"date": "2026-11-02", "time": "6:00 - 8:00", "quantity": 12, "redirect": true}
+#                           -> 201 with the slot id, or 202 without one on the Google Sheets
+#                              backend, where the row is queued and gets its id once written
+#     GET  /my-slots
+#     GET  /payment-status?id=42
+#
+# Every call after login sends "Authorization: Bearer <token>". The server
+# speaks HTTP/1.1 keep-alive, so a partner reuses one connection for many
+# requests. Bookings arriving together are written as one batch (BookingQueue).
+
+import argparse
+import hmac
+import json
+import logging
+import queue
+import secrets
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import allocator
+import storage
+
+log = logging.getLogger("kisaangrow.api")
+
+SLOTS = "Slots"
+MAX_BODY = 64 * 1024
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.body = dict(error=message, **extra)
+
+
+# =========================================================
+# SESSIONS
+# =========================================================
+
+class Sessions:
+    """Bearer tokens held in memory; a restart logs every partner out."""
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self._tokens = {}
+
+    def issue(self, farmer):
+        token = secrets.token_urlsafe(24)
+        with self.lock:
+            self._tokens[token] = (farmer, time.monotonic() + self.ttl)
+        return token
+
+    def get(self, token):
+        with self.lock:
+            entry = self._tokens.get(token)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._tokens[token]
+                return None
+            return entry[0]
+
+
+# =========================================================
+# BATCHED BOOKINGS
+# =========================================================
+
+class BookingQueue:
+    """Collects bookings for up to `wait` seconds (or `max_batch` rows) and books them with one store write.
+
+    Each append re-patches the cached Slots frame and, with a Sheet, costs a
+    journal entry and an API request; under load one write now covers a batch.
+    """
+
+    def __init__(self, slot_allocator, max_batch=200, wait=0.005):
+        self.allocator = slot_allocator
+        self.max_batch = max_batch
+        self.wait = wait
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="kisaangrow-bookings", daemon=True).start()
+
+    def submit(self, row, redirect=False):
+        """Future resolving to (booked row, row id); raises allocator.SlotFull when there is no room."""
+        future = Future()
+        self._queue.put((row, redirect, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            for redirect in (False, True):
+                part = [item for item in batch if item[1] == redirect]
+                if part:
+                    self._book(part, redirect)
+
+    def _book(self, part, redirect):
+        try:
+            results = self.allocator.book_many([row for row, _, _ in part], redirect=redirect)
+        except Exception as e:
+            log.warning("Booking batch of %d failed: %s", len(part), e)
+            for _, _, future in part:
+                future.set_exception(e)
+            return
+        for (_, _, future), result in zip(part, results):
+            if isinstance(result, allocator.SlotFull):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+# =========================================================
+# ENDPOINTS
+# =========================================================
+
+class Api:
+    def __init__(self, store, settings):
+        self.store = store
+        self.farmers = storage.KeyIndex(store, "Farmers", "Mobile", storage.normalize_mobile)
+        self.sessions = Sessions(ttl=float(settings.get("API_TOKEN_TTL", 3600)))
+        self.bookings = BookingQueue(
+            allocator.open_allocator(store, settings),
+            max_batch=int(settings.get("API_BATCH_SIZE", 200)),
+            wait=float(settings.get("API_BATCH_WAIT_MS", 5)) / 1000,
+        )
+
+    def farmer(self, headers):
+        auth = headers.get("Authorization", "")
+        farmer = self.sessions.get(auth[7:].strip()) if auth.startswith("Bearer ") else None
+        if farmer is None:
+            raise ApiError(401, "login required")
+        return farmer
+
+    def login(self, body, headers, params):
+        match = self.farmers.get(str(body.get("mobile", "")))
+        password = str(body.get("password", ""))
+        # compare_digest only takes ASCII str, so compare the UTF-8 bytes
+        if match is None or not hmac.compare_digest(str(match["Password"]).encode("utf-8"), password.encode("utf-8")):
+            raise ApiError(401, "wrong mobile or password")
+        farmer = {"mobile": storage.normalize_mobile(match["Mobile"]), "name": match["Name"]}
+        return 200, dict(farmer, token=self.sessions.issue(farmer), expires_in=int(self.sessions.ttl))
+
+    def book_slot(self, body, headers, params):
+        farmer = self.farmer(headers)
+        date, window = str(body.get("date", "")), str(body.get("time", ""))
+        try:
+            datetime.strptime(date, "%Y-%m-%d")
+            quantity = float(body.get("quantity"))
+        except (TypeError, ValueError):
+            raise ApiError(400, "date must be YYYY-MM-DD and quantity a number")
+        if window not in allocator.WINDOWS:
+            raise ApiError(400, "unknown time window", windows=allocator.WINDOWS)
+        if not 0 < quantity < float("inf"):
+            raise ApiError(400, "quantity must be positive")
+        row = {
+            "Date": date,
+            "Time": window,
+            "Quantity": quantity,
+            "Farmer_Mobile": farmer["mobile"],
+            "Farmer_Name": farmer["name"],
+            "Payment_Status": "pending",
+        }
+        try:
+            booked, row_id = self.bookings.submit(row, bool(body.get("redirect", False))).result()
+        except allocator.SlotFull as e:
+            raise ApiError(409, "slot full", remaining=e.remaining, suggestions=[
+                {"date": d, "time": w, "tonnes_free": free} for d, w, free in e.suggestions
+            ])
+        payload = {
+            "date": booked["Date"],
+            "time": booked["Time"],
+            "quantity": quantity,
+            "moved": (booked["Date"], booked["Time"]) != (date, window),
+        }
+        if not row_id:
+            return 202, payload  # capacity is reserved; the row has no id until the journal writes it
+        return 201, dict(id=int(row_id), **payload)
+
+    def my_slots(self, body, headers, params):
+        farmer = self.farmer(headers)
+        df, _ = self.store.query(
+            SLOTS, where={"Farmer_Mobile": farmer["mobile"]}, order_by="Date",
+            columns=["Date", "Time", "Quantity", "Payment_Status"],
+        )
+        return 200, {"slots": [
+            {"id": int(row_id), "date": str(r["Date"])[:10], "time": r["Time"], "quantity": r["Quantity"],
+             "payment_status": r["Payment_Status"]}
+            for row_id, r in zip(df.index, df.to_dict("records"))
+        ]}
+
+    def payment_status(self, body, headers, params):
+        farmer = self.farmer(headers)
+        try:
+            row_id = int(params.get("id", [""])[0])
+        except ValueError:
+            raise ApiError(400, "id must be a slot id")
+        row = self.store.read(SLOTS, columns=["Farmer_Mobile", "Payment_Status"], rows=[(row_id, row_id)])
+        if not len(row) or storage.normalize_mobile(row["Farmer_Mobile"].iloc[0]) != farmer["mobile"]:
+            raise ApiError(404, "no such slot")
+        return 200, {"id": row_id, "payment_status": str(row["Payment_Status"].iloc[0])}
+
+
+ROUTES = {
+    ("POST", "/login"): Api.login,
+    ("POST", "/book-slot"): Api.book_slot,
+    ("GET", "/my-slots"): Api.my_slots,
+    ("GET", "/payment-status"): Api.payment_status,
+}
+
+
+# =========================================================
+# HTTP
+# =========================================================
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: one connection serves many requests
+    server_version = "KisaanGrow"
+    # Small responses go out at once instead of waiting on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        body = {}
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY:
+                self.close_connection = True  # the unread body would be taken for the next request
+                raise ApiError(413, "request too large")
+            raw = self.rfile.read(length) if length else b""
+            endpoint = ROUTES.get((method, url.path.rstrip("/")))
+            if endpoint is None:
+                raise ApiError(404, "no such endpoint")
+            if raw:
+                try:
+                    body = json.loads(raw)
+                except ValueError:
+                    raise ApiError(400, "body is not JSON")
+                if not isinstance(body, dict):
+                    raise ApiError(400, "body must be a JSON object")
+            status, payload = endpoint(self.server.api, body, self.headers, parse_qs(url.query))
+        except ApiError as e:
+            status, payload = e.status, e.body
+        except Exception:
+            log.exception("%s %s failed", method, url.path)
+            status, payload = 500, {"error": "internal error"}
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def log_message(self, format, *args):
+        log.debug("%s " + format, self.address_string(), *args)
+
+
+def serve(settings, host="127.0.0.1", port=8080, sheets_client=None):
+    """ThreadingHTTPServer bound to the store described by settings; call serve_forever() on it."""
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.api = Api(storage.open_store(settings, sheets_client, journal_name="api"), settings)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="api.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    from config import load_secrets
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    settings = load_secrets()
+    server = serve(settings, args.host, args.port, storage.sheets_client(settings))
+    log.info("Booking API on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,164 @@
+# KisaanGrow booking archive — past seasons move out of the hot Slots table
+#
+# Bookings are partitioned by crushing season (default: October to September,
+# labelled "2025-26") or by calendar month. roll() moves every partition older
+# than the newest `keep` ones into a zstd-compressed Parquet file per partition
+# and deletes those rows from the local Slots table, so dashboards and the
+# booking path only ever read the current window. Only paid bookings are moved:
+# a pending one stays in Slots, where it can still be marked paid (and its
+# rollup updated), and goes to its partition on the first roll after that.
+# Rows keep their ids, and the Google Sheets mirror keeps the full history.
+# KPI rollups are not touched: they already hold per-date totals for the past.
+#
+# roll() runs when the store is opened; run it from cron on long-lived servers:
+#     python archive.py roll
+
+import logging
+import os
+import sys
+import threading
+
+import pandas as pd
+
+import schema
+
+log = logging.getLogger("kisaangrow.archive")
+
+SLOTS = "Slots"
+ROW_ID = "_row"
+SETTLED = "paid"
+
+
+def partition_labels(dates, by="season", start_month=10):
+    """Partition label per date; unparseable dates get None and are never archived."""
+    d = dates if pd.api.types.is_datetime64_any_dtype(dates) else pd.to_datetime(dates, format="%Y-%m-%d", errors="coerce")
+    if by == "month":
+        labels = d.dt.strftime("%Y-%m")
+    else:
+        year = d.dt.year - (d.dt.month < start_month)
+        labels = year.astype("Int64").astype(str) + "-" + ((year + 1) % 100).astype("Int64").astype(str).str.zfill(2)
+    return labels.where(d.notna(), None)
+
+
+class SlotArchive:
+    def __init__(self, path, by="season", start_month=10, keep=1):
+        self.path = path
+        self.by = by
+        self.start_month = start_month
+        self.keep = max(1, keep)
+        self.lock = threading.Lock()
+        self._cache = {}
+
+    def partition_of(self, date):
+        return partition_labels(pd.Series([date]), self.by, self.start_month).iloc[0]
+
+    def _file(self, partition):
+        return os.path.join(self.path, f"{SLOTS}-{partition}.parquet")
+
+    def partitions(self):
+        if not os.path.isdir(self.path):
+            return []
+        prefix, suffix = SLOTS + "-", ".parquet"
+        return sorted(
+            f[len(prefix):-len(suffix)] for f in os.listdir(self.path) if f.startswith(prefix) and f.endswith(suffix)
+        )
+
+    def _write(self, partition, df):
+        os.makedirs(self.path, exist_ok=True)
+        target = self._file(partition)
+        # Archive values are typed (parsed dates, categoricals); other columns as text
+        df = schema.apply(SLOTS, df, drop_sensitive=False)
+        df = df.astype({c: str for c in df.columns if df[c].dtype == object})
+        if os.path.exists(target):
+            df = pd.concat([pd.read_parquet(target), df])
+            df = df[~df.index.duplicated(keep="last")]  # rows left behind by an interrupted roll
+        df.index.name = ROW_ID
+        tmp = target + ".tmp"
+        df.sort_index().to_parquet(tmp, compression="zstd")
+        os.replace(tmp, target)
+
+    def roll(self, store, today=None):
+        """Archive the paid rows of every partition older than the newest `keep`; returns {partition: rows moved}."""
+        active = self.partition_of(pd.Timestamp(today or pd.Timestamp.today()).strftime("%Y-%m-%d"))
+        with self.lock:
+            hot, _ = store.query(SLOTS)
+            if hot.empty or "Date" not in hot.columns:
+                return {}
+            labels = partition_labels(hot["Date"], self.by, self.start_month)
+            older = sorted(p for p in labels.dropna().unique() if p < active)
+            status = hot["Payment_Status"] if "Payment_Status" in hot.columns else pd.Series("", index=hot.index)
+            settled = (status.astype(str).str.strip().str.lower() == SETTLED).to_numpy()
+            moved = {}
+            for partition in older[:max(0, len(older) - (self.keep - 1))]:
+                rows = hot[(labels == partition).to_numpy() & settled]
+                if rows.empty:
+                    continue
+                # Write first, delete second: a crash in between leaves duplicates, never gaps
+                self._write(partition, rows)
+                store.delete(SLOTS, list(rows.index))
+                self._cache.pop(partition, None)
+                moved[partition] = len(rows)
+                log.info("Archived %d %s bookings to %s", len(rows), partition, self._file(partition))
+            return moved
+
+    def read(self, partition, columns=None):
+        """One archived partition as a typed DataFrame indexed by row id (cached by file mtime)."""
+        path = self._file(partition)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        mtime = os.path.getmtime(path)
+        with self.lock:
+            cached = self._cache.get(partition)
+            if cached is None or cached[0] != mtime:
+                if len(self._cache) >= 4:
+                    self._cache.pop(next(iter(self._cache)))
+                cached = self._cache[partition] = (mtime, pd.read_parquet(path))
+        df = cached[1]
+        return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+    def iter_query(self, date_from=None, date_to=None, where=None):
+        """Matching rows one partition at a time, reading only the partitions the date range spans."""
+        lo = self.partition_of(date_from) if date_from else None
+        hi = self.partition_of(date_to) if date_to else None
+        for partition in self.partitions():
+            if (lo and partition < lo) or (hi and partition > hi):
+                continue
+            df = self.read(partition)
+            if date_from:
+                df = df[df["Date"] >= pd.Timestamp(date_from)]
+            if date_to:
+                df = df[df["Date"] <= pd.Timestamp(date_to)]
+            for col, value in (where or {}).items():
+                df = df[df[col].astype(str) == str(value)] if col in df.columns else df.iloc[0:0]
+            if len(df):
+                yield df
+
+    def query(self, date_from=None, date_to=None, where=None, columns=None):
+        """Historical bookings in an inclusive date range."""
+        frames = list(self.iter_query(date_from, date_to, where))
+        df = pd.concat(frames) if frames else pd.DataFrame()
+        return df if columns is None else df[[c for c in columns if c in df.columns]]
+
+    def read_all(self):
+        frames = [self.read(p) for p in self.partitions()]
+        return pd.concat(frames) if frames else pd.DataFrame()
+
+
+def open_archive(settings):
+    """ARCHIVE_DIR, ARCHIVE_PARTITION ("season"/"month"), SEASON_START_MONTH, ARCHIVE_KEEP."""
+    return SlotArchive(
+        settings.get("ARCHIVE_DIR", "archive"),
+        by=settings.get("ARCHIVE_PARTITION", "season"),
+        start_month=int(settings.get("SEASON_START_MONTH", 10)),
+        keep=int(settings.get("ARCHIVE_KEEP", 1)),
+    )
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["roll"]:
+        sys.exit("usage: python archive.py roll")
+    import storage
+    from config import load_secrets
+    settings = load_secrets()
+    moved = open_archive(settings).roll(storage.open_store(settings, roll_archive=False))
+    print(f"Archived {sum(moved.values())} bookings: {moved or 'nothing to do'}")
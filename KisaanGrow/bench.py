@@ -0,0 +1,320 @@
+# KisaanGrow benchmarks — page reruns against synthetic data, no credentials needed
+#
+# Runs the real Streamlit script (streamlit.testing AppTest) with gspread and
+# OpenAI replaced by fakes.FakeClient / fakes.FakeOpenAI, on generated Farmers
+# and Slots of each requested size. For every page it reports the cold rerun
+# (caches cleared: store open, seeding, first read), warm reruns, Sheets and
+# OpenAI requests of the cold rerun and per warm rerun, and peak Python memory of a cold and a warm
+# rerun (traced in separate passes, so tracing does not skew the timings).
+#     python bench.py                                  # 1k, 100k, 1M slots on SQLite
+#     python bench.py --sizes 1k,100k --backend sheets --json bench.json
+#     python bench.py --baseline bench.json            # exit 1 on >25% slower
+#     python bench.py --startup                        # cold start per page, fresh interpreters
+#
+# Backends: "sqlite" (local store, no Sheet), "mirror" (SQLite seeded from and
+# mirrored to a fake Sheet) and "sheets" (Google Sheets as the store).
+#
+# --startup runs each page once in a new Python process on SQLite and reports
+# the import time, the first and a warm rerun, and which heavy libraries
+# (gspread, openai, plotly) the page pulled in beyond what Streamlit imports by
+# itself (it loads plotly for its chart theme). fakes is imported inside Bench
+# only, so those processes load nothing the app itself does not.
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import allocator
+import storage
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP = os.path.join(HERE, "KisanGrowApp.py")
+PAGES = ["login", "farmer", "corp"]
+STARTUP_PAGES = ["home", "register", "farmer", "corp"]
+HEAVY = ["gspread", "openai", "plotly"]
+PASSWORD = "Bench1234"
+ADMIN = "B0001"
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def synthetic(n_slots, seed=7):
+    """Farmers, Slots and Corporates as DataFrames; bookings spread over the 60 days around today."""
+    rng = np.random.default_rng(seed)
+    n_farmers = max(50, n_slots // 20)
+    mobiles = pd.Series(np.arange(n_farmers) + 9_000_000_000).astype(str)
+    farmers = pd.DataFrame({
+        "Name": "Farmer " + mobiles.str[-6:],
+        "Mobile": mobiles,
+        "Aadhar": pd.Series(np.arange(n_farmers) + 100_000_000_000).astype(str),
+        "Village": pd.Series(rng.choice(["Rampur", "Sitapur", "Khurja", "Baraut"], n_farmers)),
+        "Password": PASSWORD,
+    })
+    who = rng.integers(0, n_farmers, n_slots)
+    today = pd.Timestamp.today().normalize()
+    slots = pd.DataFrame({
+        "Date": (today + pd.to_timedelta(rng.integers(-45, 15, n_slots), unit="D")).strftime("%Y-%m-%d"),
+        "Time": np.array(allocator.WINDOWS)[rng.integers(0, len(allocator.WINDOWS), n_slots)],
+        "Quantity": rng.integers(1, 40, n_slots).astype(str),
+        "Farmer_Mobile": farmers["Mobile"].to_numpy()[who],
+        "Farmer_Name": farmers["Name"].to_numpy()[who],
+        "Payment_Status": np.where(rng.random(n_slots) < 0.6, "paid", "pending"),
+    })
+    corporates = pd.DataFrame([{"Name": "Bench Admin", "Corp_ID": ADMIN, "Role": "admin", "Password": PASSWORD}])
+    return {"Farmers": farmers, "Slots": slots, "Corporates": corporates}
+
+
+def page_state(page, data):
+    """Session state that opens `page` already logged in (where it needs a login)."""
+    if page == "farmer":
+        farmer = data["Slots"].iloc[0]
+        return {"user": "farmer", "mobile": farmer["Farmer_Mobile"], "name": farmer["Farmer_Name"],
+                "page": "Farmer Dashboard"}
+    if page == "corp":
+        return {"user": "corp", "emp": ADMIN, "corp_name": "Bench Admin", "page": "Corporate Dashboard"}
+    if page == "register":
+        return {"page": "Farmer Registration"}
+    return {}
+
+
+def _sheet_rows(df):
+    return [list(df.columns)] + df.astype(str).values.tolist()
+
+
+class Bench:
+    def __init__(self, n_slots, backend="sqlite", reruns=5, workdir=None, quota_per_minute=None):
+        """quota_per_minute: give the fake Sheet the real API's quota and keep the scheduler at its defaults."""
+        self.n_slots = n_slots
+        self.backend = backend
+        self.reruns = reruns
+        self.dir = workdir or tempfile.mkdtemp(prefix="kg-bench-")
+        import fakes
+        self.data = synthetic(n_slots)
+        self.sheets = fakes.FakeClient(quota_per_minute=quota_per_minute)
+        self.openai = fakes.FakeOpenAI()
+        self.settings = {
+            "OPENAI_API_KEY": "bench",
+            "SQLITE_PATH": os.path.join(self.dir, "bench.db"),
+            "JOURNAL_PATH": os.path.join(self.dir, "bench.journal"),
+            "ADVICE_CACHE_PATH": os.path.join(self.dir, "advice.db"),
+            "ARCHIVE_DIR": os.path.join(self.dir, "archive"),
+            "PROFILING_ADMINS": ADMIN,
+        }
+        if quota_per_minute is None:
+            # The fake Sheet has no quota; keep the scheduler out of the timings too
+            self.settings.update(SHEETS_RATE_PER_MIN=1_000_000, SHEETS_BURST=1_000_000)
+        if backend != "sqlite":
+            self.settings.update(SHEET_ID="bench", GCP_SERVICE_ACCOUNT="{}", STORAGE_BACKEND=(
+                "sheets" if backend == "sheets" else "sqlite"
+            ))
+        self._load()
+
+    def _load(self):
+        if self.backend == "sqlite":
+            store = storage.SQLiteStore(self.settings["SQLITE_PATH"])
+            for sheet, df in self.data.items():
+                for i in range(0, len(df), 50_000):
+                    store.append(sheet, df.iloc[i:i + 50_000].to_dict("records"))
+        else:
+            import fakes
+            for sheet, df in self.data.items():
+                self.sheets.spreadsheet.worksheets[sheet] = fakes.FakeWorksheet(self.sheets, sheet, _sheet_rows(df))
+
+    def close(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _app(self, **state):
+        from streamlit.testing.v1 import AppTest
+        at = AppTest.from_file(APP, default_timeout=900)
+        for key, value in self.settings.items():
+            at.secrets[key] = value
+        for key, value in state.items():
+            at.session_state[key] = value
+        return at
+
+    def _rerun(self, page, at=None):
+        """One measured rerun; returns (seconds, app). For login, a fresh session submits the form."""
+        if page == "login":
+            at = self._app()
+            at.run()
+            at.text_input[0].input(self.data["Slots"].iloc[0]["Farmer_Mobile"])
+            at.text_input[1].input(PASSWORD)
+            started = time.perf_counter()
+            at.button[0].click().run()
+        else:
+            at = at or self._app(**page_state(page, self.data))
+            started = time.perf_counter()
+            at.run()
+        elapsed = time.perf_counter() - started
+        if at.exception:
+            raise RuntimeError(f"{page} page failed: {at.exception[0].value}")
+        if page == "login" and at.session_state["user"] != "farmer":
+            raise RuntimeError("login page did not log the farmer in")
+        return elapsed, at
+
+    def _cold(self, page):
+        import streamlit as st
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        return self._rerun(page)
+
+    def page(self, page):
+        sheets_before, openai_before = self.sheets.total, self.openai.total
+        cold, at = self._cold(page)
+        cold_sheets, cold_openai = self.sheets.total - sheets_before, self.openai.total - openai_before
+
+        warm = []
+        sheets_before, openai_before = self.sheets.total, self.openai.total
+        for _ in range(self.reruns):
+            elapsed, at = self._rerun(page, None if page == "login" else at)
+            warm.append(elapsed)
+
+        peaks = []
+        for rerun in (lambda: self._cold(page), lambda: self._rerun(page, None if page == "login" else at)):
+            tracemalloc.start()
+            rerun()
+            peaks.append(tracemalloc.get_traced_memory()[1] / 2**20)
+            tracemalloc.stop()
+        return {
+            "slots": self.n_slots,
+            "backend": self.backend,
+            "page": page,
+            "cold_ms": cold * 1000,
+            "cold_sheets_calls": cold_sheets,
+            "cold_openai_calls": cold_openai,
+            "warm_p50_ms": statistics.median(warm) * 1000,
+            "warm_max_ms": max(warm) * 1000,
+            "sheets_calls": (self.sheets.total - sheets_before) / self.reruns,
+            "openai_calls": (self.openai.total - openai_before) / self.reruns,
+            "cold_peak_mb": peaks[0],
+            "warm_peak_mb": peaks[1],
+        }
+
+    def run(self, pages=PAGES):
+        import fakes
+        with fakes.installed(self.sheets, self.openai):
+            return [self.page(p) for p in pages]
+
+
+def startup(page, n_slots=1_000):
+    """Cold start of one page in a new interpreter; see _startup for the fields."""
+    code = (f"import time; t = time.perf_counter(); import bench; "
+            f"print(bench.json.dumps(bench._startup({page!r}, {n_slots}, t)))")
+    out = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(f"{page} startup failed: {out.stderr.strip().splitlines()[-1]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _startup(page, n_slots, started):
+    """Child side of startup(): import_ms (pandas, Streamlit, the store), first_ms and warm_ms reruns, loaded."""
+    import logging
+    logging.disable(logging.WARNING)
+    from streamlit.testing.v1 import AppTest
+    import advice
+    imported = time.perf_counter() - started
+    preloaded = {name for name in HEAVY if name in sys.modules}
+
+    workdir = tempfile.mkdtemp(prefix="kg-startup-")
+    try:
+        data = synthetic(n_slots)
+        store = storage.SQLiteStore(os.path.join(workdir, "bench.db"))
+        for sheet, df in data.items():
+            store.append(sheet, df.to_dict("records"))
+        # The real OpenAI client is built (that is part of the cost); only the request is answered locally
+        advice.stream = lambda client, prompt: iter(["Deliver early in the morning."])
+        at = AppTest.from_file(APP, default_timeout=300)
+        for key, value in {
+            "OPENAI_API_KEY": "bench",
+            "SQLITE_PATH": os.path.join(workdir, "bench.db"),
+            "JOURNAL_PATH": os.path.join(workdir, "bench.journal"),
+            "ADVICE_CACHE_PATH": os.path.join(workdir, "advice.db"),
+            "ARCHIVE_DIR": os.path.join(workdir, "archive"),
+        }.items():
+            at.secrets[key] = value
+        for key, value in page_state(page, data).items():
+            at.session_state[key] = value
+        timings = []
+        for _ in range(2):
+            began = time.perf_counter()
+            at.run()
+            timings.append(time.perf_counter() - began)
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+        return {
+            "page": page,
+            "import_ms": imported * 1000,
+            "first_ms": timings[0] * 1000,
+            "warm_ms": timings[1] * 1000,
+            "loaded": [name for name in HEAVY if name in sys.modules and name not in preloaded],
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def regressions(results, baseline, tolerance=1.25):
+    """Rows whose warm p50 grew by more than `tolerance` x the baseline run (same size/backend/page)."""
+    key = ["slots", "backend", "page"]
+    merged = pd.DataFrame(results).merge(pd.DataFrame(baseline), on=key, suffixes=("", "_base"))
+    return merged[merged["warm_p50_ms"] > merged["warm_p50_ms_base"] * tolerance][
+        key + ["warm_p50_ms_base", "warm_p50_ms"]
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="bench.py")
+    parser.add_argument("--sizes", default="1k,100k,1M", help="slot counts, e.g. 1k,100k,1M")
+    parser.add_argument("--backend", choices=["sqlite", "mirror", "sheets"], default="sqlite")
+    parser.add_argument("--pages", default=",".join(PAGES))
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--json", help="write results here")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    parser.add_argument("--startup", action="store_true", help="cold start of each page in a fresh interpreter")
+    args = parser.parse_args()
+
+    if args.startup:
+        for page in STARTUP_PAGES:
+            row = startup(page)
+            print(f"{page:<9} import {row['import_ms']:7.1f} ms  first {row['first_ms']:7.1f} ms  "
+                  f"warm {row['warm_ms']:6.1f} ms  loaded: {', '.join(row['loaded']) or '-'}", flush=True)
+        sys.exit()
+
+    import logging
+    # AppTest runs without a server and the script runner says so on every rerun
+    logging.disable(logging.WARNING)
+    results = []
+    for size in [parse_size(s) for s in args.sizes.split(",")]:
+        bench = Bench(size, args.backend, args.reruns)
+        try:
+            for row in bench.run(args.pages.split(",")):
+                results.append(row)
+                print(f"{row['slots']:>9,} {row['page']:<7} cold {row['cold_ms']:9.1f} ms  "
+                      f"warm {row['warm_p50_ms']:8.1f} ms  sheets {row['cold_sheets_calls']} + {row['sheets_calls']:.1f}/rerun  "
+                      f"openai {row['cold_openai_calls']} + {row['openai_calls']:.1f}/rerun  peak {row['cold_peak_mb']:7.1f} / {row['warm_peak_mb']:.1f} MB", flush=True)
+        finally:
+            bench.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f), args.tolerance)
+        if len(slower):
+            print(f"\nSlower than baseline by more than {args.tolerance:g}x:\n{slower.round(1).to_string(index=False)}")
+            sys.exit(1)
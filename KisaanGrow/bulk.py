@@ -0,0 +1,172 @@
+# KisaanGrow bulk import / export — onboard a cooperative, pull a season report
+#
+# Imports read CSV or Parquet in chunks, validate each chunk column-wise with
+# the same rules as the registration forms, and write the good rows with one
+# store.append() per chunk. Exports page through Slots (and the season archive)
+# and write each page straight to the output, so neither side ever holds the
+# whole sheet in memory.
+#     python bulk.py import Farmers farmers.csv [rejects.csv]
+#     python bulk.py export slots.csv [--from 2025-10-01] [--to 2026-03-31] [--status paid]
+
+import argparse
+
+import pandas as pd
+
+import schema
+import storage
+
+CHUNK = 5000
+PASSWORD_RULE = r"^(?=.*[a-z])(?=.*[A-Z])(?=.*\d).{8,}$"
+
+COLUMNS = {
+    "Farmers": ["Name", "Mobile", "Aadhar", "Village", "Password"],
+    "Corporates": ["Name", "Corp_ID", "Role", "Password"],
+}
+KEYS = {"Farmers": ("Mobile", storage.normalize_mobile), "Corporates": ("Corp_ID", storage.normalize_key)}
+
+
+def _is_parquet(source, fmt):
+    name = fmt or getattr(source, "name", source)
+    return str(name).lower().endswith("parquet")
+
+
+def read_chunks(source, chunk=CHUNK, fmt=None):
+    """DataFrames of at most `chunk` rows, all values as stripped strings."""
+    if _is_parquet(source, fmt):
+        import pyarrow.parquet as pq
+        batches = (b.to_pandas() for b in pq.ParquetFile(source).iter_batches(batch_size=chunk))
+    else:
+        batches = pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunk)
+    for df in batches:
+        df.columns = [str(c).strip() for c in df.columns]
+        yield df.fillna("").astype(str).apply(lambda s: s.str.strip())
+
+
+def validate(sheet, df, known):
+    """Split a chunk into (rows to append, rejected rows with a Reason); adds accepted keys to known."""
+    missing = [c for c in COLUMNS[sheet] if c not in df.columns]
+    if missing:
+        raise ValueError(f"{sheet} import is missing columns: {', '.join(missing)}")
+    key_col, _ = KEYS[sheet]
+    df = df[COLUMNS[sheet]].copy()
+    if sheet == "Farmers":
+        df["Mobile"] = schema.mobile_series(df["Mobile"]).astype(object)
+    else:
+        df[key_col] = df[key_col].str.replace(r"\.0$", "", regex=True)
+
+    checks = [(df["Name"] == "", "missing name")]
+    if sheet == "Farmers":
+        checks += [
+            (df["Mobile"].str.len() != 10, "invalid mobile"),
+            (~df["Aadhar"].str.fullmatch(r"\d{12}"), "invalid Aadhar"),
+        ]
+    else:
+        checks += [(df[key_col] == "", "missing Corp_ID")]
+    checks += [
+        (~df["Password"].str.match(PASSWORD_RULE), "password must be 8+ chars with upper, lower and a number"),
+        (df[key_col].duplicated(), f"duplicate {key_col} in file"),
+        (df[key_col].isin(known), "already registered"),
+    ]
+    # First failing check wins
+    reason = pd.Series("", index=df.index)
+    for mask, message in checks:
+        reason = reason.mask((reason == "") & mask, message)
+
+    good = df[reason == ""]
+    known.update(good[key_col])
+    rejected = df[reason != ""].drop(columns=["Password"]).assign(Reason=reason[reason != ""])
+    return good, rejected
+
+
+def import_rows(store, sheet, source, chunk=CHUNK, fmt=None):
+    """Import Farmers or Corporates from a CSV/Parquet path or file; returns (rows added, rejects)."""
+    if sheet not in COLUMNS:
+        raise ValueError(f"Can only import {' or '.join(COLUMNS)}")
+    key_col, normalize = KEYS[sheet]
+    known = {normalize(v) for v in store.distinct(sheet, key_col)}
+    added = 0
+    rejects = []
+    for df in read_chunks(source, chunk, fmt):
+        good, bad = validate(sheet, df, known)
+        if len(good):
+            store.append(sheet, good.to_dict("records"))
+            added += len(good)
+        if len(bad):
+            rejects.append(bad)
+    return added, pd.concat(rejects) if rejects else pd.DataFrame(columns=COLUMNS[sheet][:-1] + ["Reason"])
+
+
+def iter_slots(store, date_from=None, date_to=None, status=None, chunk=CHUNK, archive=None):
+    """Filtered Slots pages (archived seasons first, then the live table), oldest first."""
+    where = {"Payment_Status": status} if status else None
+    if archive is not None:
+        for old in archive.iter_query(date_from, date_to, where):
+            old = old.assign(Date=schema.date_str(old["Date"]))
+            for i in range(0, len(old), chunk):
+                yield old.iloc[i:i + chunk]
+    # Date range in the query (Date is indexed), pages by row id: no OFFSET scan, no count
+    between = {"Date": (date_from, date_to)} if date_from or date_to else None
+    last = None
+    while True:
+        page, _ = store.query("Slots", where=where, between=between, after=last, limit=chunk, count=False)
+        if page.empty:
+            return
+        last = int(page.index[-1])
+        yield page
+
+
+def export_slots(store, out, date_from=None, date_to=None, status=None, chunk=CHUNK, fmt="csv", archive=None):
+    """Write filtered bookings to a path or binary file, page by page; returns the row count."""
+    rows = 0
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for page in iter_slots(store, date_from, date_to, status, chunk, archive):
+                page = page.astype(str).assign(Quantity=pd.to_numeric(page["Quantity"], errors="coerce"))
+                table = pa.Table.from_pandas(page.rename_axis(storage.ROW_ID).reset_index(), preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(out, table.schema, compression="zstd")
+                writer.write_table(table.cast(writer.schema))
+                rows += len(page)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
+    for page in iter_slots(store, date_from, date_to, status, chunk, archive):
+        out.write(page.to_csv(header=rows == 0, index_label=storage.ROW_ID).encode("utf-8"))
+        rows += len(page)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="bulk.py")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import")
+    imp.add_argument("sheet", choices=list(COLUMNS))
+    imp.add_argument("source")
+    imp.add_argument("rejects", nargs="?")
+    exp = sub.add_parser("export")
+    exp.add_argument("target")
+    exp.add_argument("--from", dest="date_from")
+    exp.add_argument("--to", dest="date_to")
+    exp.add_argument("--status", choices=["paid", "pending"])
+    args = parser.parse_args()
+
+    from archive import open_archive
+    from config import load_secrets
+    settings = load_secrets()
+    store = storage.open_store(settings, storage.sheets_client(settings), journal_name="bulk")
+    if args.cmd == "import":
+        added, rejects = import_rows(store, args.sheet, args.source)
+        if args.rejects and len(rejects):
+            rejects.to_csv(args.rejects, index=False)
+        print(f"Imported {added} {args.sheet}, rejected {len(rejects)}")
+    else:
+        fmt = "parquet" if _is_parquet(args.target, None) else "csv"
+        with open(args.target, "wb") as f:
+            rows = export_slots(
+                store, f, args.date_from, args.date_to, args.status, fmt=fmt, archive=open_archive(settings)
+            )
+        print(f"Exported {rows} bookings to {args.target}")
@@ -0,0 +1,24 @@
+# KisaanGrow settings for command-line tools — same keys as .streamlit/secrets.toml
+
+import os
+import tomllib
+
+SECRETS_PATHS = [
+    os.path.join(".streamlit", "secrets.toml"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".streamlit", "secrets.toml"),
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+]
+
+
+def load_secrets(path=None):
+    """Read the Streamlit secrets file outside Streamlit; KISAANGROW_<KEY> env vars override."""
+    settings = {}
+    for candidate in [path] if path else SECRETS_PATHS:
+        if candidate and os.path.exists(candidate):
+            with open(candidate, "rb") as f:
+                settings = tomllib.load(f)
+            break
+    for key, value in os.environ.items():
+        if key.startswith("KISAANGROW_"):
+            settings[key[len("KISAANGROW_"):]] = value
+    return settings
@@ -0,0 +1,193 @@
+# KisaanGrow fakes — in-memory stand-ins for the Google Sheets and OpenAI clients
+#
+# FakeClient implements the part of the gspread API that storage.SheetsStore
+# uses, so the Sheets code paths (delta sync, journal, scheduler) can be run
+# without a service account:
+#     store = storage.open_store({"SHEET_ID": "local", "STORAGE_BACKEND": "sheets"}, fakes.FakeClient())
+# quota_per_minute makes it answer 429 like the real API once the budget is
+# spent, and latency adds a fixed delay to every request.
+#
+# FakeOpenAI answers chat completions (plain or streamed) with canned advice.
+# installed() swaps both in for the real libraries, so the Streamlit app itself
+# runs unchanged on them (bench.py, loadtest.py).
+
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import gspread
+from gspread.utils import a1_range_to_grid_range
+
+
+class _Response:
+    def __init__(self, code, message):
+        self.status_code = code
+        self.text = message
+        self._body = {"error": {"code": code, "message": message, "status": "RESOURCE_EXHAUSTED"}}
+
+    def json(self):
+        return self._body
+
+
+class FakeClient:
+    def __init__(self, sheets=None, quota_per_minute=None, latency=0.0):
+        """sheets: {worksheet name: [header row, row, ...]} to start from."""
+        self.quota_per_minute = quota_per_minute
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = []
+        self.rejected = 0
+        self.total = 0
+        self.spreadsheet = FakeSpreadsheet(self)
+        for name, rows in (sheets or {}).items():
+            self.spreadsheet.worksheets[name] = FakeWorksheet(self, name, rows)
+
+    def _request(self, kind):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            now = time.monotonic()
+            self.requests = [t for t in self.requests if now - t[0] < 60]
+            if self.quota_per_minute is not None and len(self.requests) >= self.quota_per_minute:
+                self.rejected += 1
+                raise gspread.exceptions.APIError(_Response(429, "Quota exceeded for quota metric 'Read requests'"))
+            self.requests.append((now, kind))
+            self.total += 1
+
+    def calls(self, kind=None):
+        """Requests accepted in the last minute, optionally of one kind."""
+        with self.lock:
+            return sum(1 for _, k in self.requests if kind is None or k == kind)
+
+    def open_by_key(self, key):
+        self._request("open_by_key")
+        return self.spreadsheet
+
+
+class FakeSpreadsheet:
+    def __init__(self, client):
+        self.client = client
+        self.worksheets = {}
+
+    def worksheet(self, name):
+        self.client._request("worksheet")
+        if name not in self.worksheets:
+            raise gspread.WorksheetNotFound(name)
+        return self.worksheets[name]
+
+    def add_worksheet(self, name, rows=100, cols=26):
+        self.client._request("add_worksheet")
+        ws = self.worksheets[name] = FakeWorksheet(self.client, name, [])
+        return ws
+
+
+class FakeWorksheet:
+    def __init__(self, client, title, rows):
+        self.client = client
+        self.title = title
+        self.rows = [[str(v) for v in r] for r in rows]
+        self.lock = threading.Lock()
+
+    def _width(self):
+        return max((len(r) for r in self.rows), default=0)
+
+    def _range(self, a1):
+        grid = a1_range_to_grid_range(a1)
+        r0, r1 = grid.get("startRowIndex", 0), grid.get("endRowIndex", len(self.rows))
+        c0, c1 = grid.get("startColumnIndex", 0), grid.get("endColumnIndex", self._width())
+        values = [(r + [""] * c1)[c0:c1] for r in self.rows[r0:r1]]
+        # The API trims trailing empty rows and cells
+        for v in values:
+            while v and v[-1] == "":
+                v.pop()
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def row_values(self, row):
+        self.client._request("row_values")
+        with self.lock:
+            return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def get(self, range_name=None, pad_values=False, **kwargs):
+        self.client._request("get")
+        with self.lock:
+            values = self._range(range_name) if range_name else [list(r) for r in self.rows]
+            if pad_values:
+                width = max((len(r) for r in values), default=0)
+                values = [r + [""] * (width - len(r)) for r in values]
+        return values
+
+    def batch_get(self, ranges, **kwargs):
+        self.client._request("batch_get")
+        with self.lock:
+            return [self._range(r) for r in ranges]
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values])
+
+    def append_rows(self, values, **kwargs):
+        self.client._request("append_rows")
+        with self.lock:
+            self.rows.extend([str(v) for v in r] for r in values)
+
+    def batch_update(self, data, raw=True, **kwargs):
+        self.client._request("batch_update")
+        with self.lock:
+            for item in data:
+                grid = a1_range_to_grid_range(item["range"])
+                for i, row in enumerate(item["values"]):
+                    r = grid.get("startRowIndex", 0) + i
+                    while len(self.rows) <= r:
+                        self.rows.append([])
+                    for j, value in enumerate(row):
+                        c = grid.get("startColumnIndex", 0) + j
+                        self.rows[r].extend([""] * (c + 1 - len(self.rows[r])))
+                        self.rows[r][c] = str(value)
+
+
+ADVICE = ("Harvest close to your slot time, keep the cane shaded and covered on the trailer, "
+          "and carry your booking ID to the mill gate.")
+
+
+class FakeOpenAI:
+    def __init__(self, latency=0.0, text=ADVICE, **kwargs):
+        """latency: seconds before the first token; kwargs (api_key, ...) are ignored."""
+        self.latency = latency
+        self.text = text
+        self.lock = threading.Lock()
+        self.total = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model=None, messages=None, stream=False, **kwargs):
+        with self.lock:
+            self.total += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if not stream:
+            message = SimpleNamespace(content=self.text)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        words = self.text.split(" ")
+        return (
+            SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=w + (" " if i < len(words) - 1 else "")))])
+            for i, w in enumerate(words)
+        )
+
+
+@contextmanager
+def installed(sheets=None, openai_client=None):
+    """Make gspread.authorize() return `sheets` and openai.OpenAI() return `openai_client` meanwhile."""
+    import openai
+    from google.oauth2.service_account import Credentials
+
+    saved = gspread.authorize, Credentials.__dict__["from_service_account_info"], openai.OpenAI
+    if sheets is not None:
+        gspread.authorize = lambda *args, **kwargs: sheets
+        Credentials.from_service_account_info = classmethod(lambda cls, info, **kwargs: None)
+    if openai_client is not None:
+        openai.OpenAI = lambda *args, **kwargs: openai_client
+    try:
+        yield
+    finally:
+        gspread.authorize, Credentials.from_service_account_info, openai.OpenAI = saved
@@ -0,0 +1,222 @@
+# KisaanGrow write-ahead journal — durable local queue in front of Google Sheets writes
+#
+# append()/update() only write a JSON line to the journal file and fsync it, so a
+# booking click never waits on the Sheets API. A background worker drains the
+# queue into the sink (normally storage.SheetsStore), coalescing consecutive
+# appends to the same worksheet into one append_rows call. Flushed entries are
+# recorded in a checkpoint file; anything after the checkpoint is replayed on
+# restart, so a crash or API outage never drops queued rows. Delivery is
+# at-least-once, so every appended row carries a key (storage.WRITE_ID): an append
+# that failed or was cut off by a crash is re-sent with verify, and the sink skips
+# the rows Sheets had already applied.
+#
+# A journal belongs to one process: it holds an exclusive lock on <path>.lock,
+# and a second process opening the same path gets JournalBusy instead of
+# checkpointing and compacting the first one's entries away.
+
+import json
+import logging
+import os
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, one process per journal is up to the operator
+    fcntl = None
+
+log = logging.getLogger("kisaangrow.journal")
+
+COMPACT_BYTES = 1 << 20
+
+
+class JournalBusy(RuntimeError):
+    pass
+
+
+def _lock(path):
+    fh = open(path, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fh.close()
+            raise JournalBusy(
+                f"{path} is held by another process; give this one its own JOURNAL_PATH"
+            ) from None
+    return fh
+
+
+def _new_key():
+    return "j-" + uuid.uuid4().hex[:16]  # never all digits, so never mistaken for a mirror row id
+
+
+def _fsync_write(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class WriteJournal:
+    def __init__(self, path, sink, interval=2.0, max_backoff=60.0):
+        self.path = path
+        self.ckpt_path = path + ".ckpt"
+        self.sink = sink
+        self._lock_fh = _lock(path + ".lock")
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.pending = []
+        self.unsure = set()  # seqs of appends that may already be in the sheet
+        self.seq = 0
+        self.sheet_seq = {}  # sheet -> seq of its latest entry
+        self._stop = threading.Event()
+        self._thread = None
+        self._recover()
+        self.fh = open(path, "a", encoding="utf-8")
+
+    def _recover(self):
+        done = 0
+        if os.path.exists(self.ckpt_path):
+            with open(self.ckpt_path, encoding="utf-8") as f:
+                done = int(f.read().strip() or 0)
+        self.seq = done
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from a crash mid-line
+                    self.seq = max(self.seq, entry["seq"])
+                    self.sheet_seq[entry["sheet"]] = max(self.sheet_seq.get(entry["sheet"], 0), entry["seq"])
+                    if entry["seq"] > done:
+                        if entry["op"] == "append":
+                            entry.setdefault("key", _new_key())
+                            self.unsure.add(entry["seq"])
+                        self.pending.append(entry)
+        if self.pending:
+            log.info("Replaying %d journaled writes from %s", len(self.pending), self.path)
+
+    # ---------------- producer side ----------------
+
+    def _log(self, op, sheet, items, keys=None):
+        with self.lock:
+            entries = []
+            for i, data in enumerate(items):
+                self.seq += 1
+                entry = {"seq": self.seq, "op": op, "sheet": sheet, "data": data}
+                if op == "append":
+                    entry["key"] = str(keys[i]) if keys is not None else _new_key()
+                entries.append(entry)
+            self.sheet_seq[sheet] = self.seq
+            self.fh.write("".join(json.dumps(e, default=str) + "\n" for e in entries))
+            self.fh.flush()
+            os.fsync(self.fh.fileno())
+            self.pending.extend(entries)
+
+    def append(self, sheet, rows, keys=None):
+        self._log("append", sheet, rows, keys)
+        return []
+
+    def update(self, sheet, changes):
+        self._log("update", sheet, [{str(k): v for k, v in changes.items()}])
+
+    def last_seq(self, sheet):
+        """Seq of the latest write journaled for sheet (0 if none), a per-sheet change counter."""
+        with self.lock:
+            return self.sheet_seq.get(sheet, 0)
+
+    def pending_rows(self, sheet):
+        with self.lock:
+            return [e["data"] for e in self.pending if e["op"] == "append" and e["sheet"] == sheet]
+
+    def pending_updates(self, sheet):
+        merged = {}
+        with self.lock:
+            for e in self.pending:
+                if e["op"] == "update" and e["sheet"] == sheet:
+                    for row_id, values in e["data"].items():
+                        merged.setdefault(int(row_id), {}).update(values)
+        return merged
+
+    def backlog(self):
+        with self.lock:
+            return len(self.pending)
+
+    # ---------------- consumer side ----------------
+
+    def _checkpoint(self, seq):
+        _fsync_write(self.ckpt_path, str(seq))
+        with self.lock:
+            self.pending = [e for e in self.pending if e["seq"] > seq]
+            if not self.pending and self.fh.tell() > COMPACT_BYTES:
+                self.fh.close()
+                self.fh = open(self.path, "w", encoding="utf-8")
+
+    def flush(self):
+        """Push every pending entry to the sink; returns how many were written."""
+        with self.flush_lock:
+            with self.lock:
+                batch = list(self.pending)
+            written = 0
+            i = 0
+            while i < len(batch):
+                op, sheet = batch[i]["op"], batch[i]["sheet"]
+                j = i
+                while j < len(batch) and batch[j]["op"] == op and batch[j]["sheet"] == sheet:
+                    j += 1
+                run = batch[i:j]
+                seqs = {e["seq"] for e in run}
+                try:
+                    if op == "append":
+                        self.sink.append(
+                            sheet, [e["data"] for e in run], keys=[e["key"] for e in run],
+                            verify=not self.unsure.isdisjoint(seqs),
+                        )
+                    else:
+                        merged = {}
+                        for e in run:
+                            for row_id, values in e["data"].items():
+                                merged.setdefault(int(row_id), {}).update(values)
+                        self.sink.update(sheet, merged)
+                except BaseException:
+                    if op == "append":
+                        self.unsure |= seqs  # e.g. a timeout after Sheets applied it
+                    raise
+                self.unsure -= seqs
+                self._checkpoint(run[-1]["seq"])
+                written += len(run)
+                i = j
+            return written
+
+    def _run(self):
+        delay = self.interval
+        while not self._stop.wait(delay):
+            try:
+                self.flush()
+                delay = self.interval
+            except Exception as e:
+                delay = min(delay * 2, self.max_backoff)
+                log.warning("Journal flush failed (%d queued, retry in %.0fs): %s", self.backlog(), delay, e)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="kisaangrow-journal", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.flush()
+        except Exception as e:
+            log.warning("Final journal flush failed, %d writes stay queued: %s", self.backlog(), e)
+        self.fh.close()
+        self._lock_fh.close()
@@ -0,0 +1,326 @@
+# KisaanGrow load test — many concurrent sessions against one worker process
+#
+# Simulated users arrive at random (Poisson) at a given rate and walk through
+# the real app (streamlit.testing AppTest, one session per user, all sharing
+# this process's caches and store like sessions on one Streamlit server):
+#   farmer: open home -> log in -> book a slot (2-6 weeks out) -> view my slots
+#   corp:   open home -> log in -> filter by farmer -> select all -> mark paid
+# Google Sheets and OpenAI are the fakes from fakes.py (see bench.py for the
+# data and backends). Each step is one rerun, timed from the user's click to
+# the finished page; that includes AppTest turning the page into an element
+# tree, so treat the numbers as a slight overestimate of a real server's.
+#     python loadtest.py --rate 2 --duration 60
+#     python loadtest.py --ramp 0.5,1,2,4,8 --slo 1000   # find the sustainable rate
+#
+# On the mirror and sheets backends the fake Sheet enforces the real per-minute
+# quota (QUOTA_PER_MINUTE, answering 429 past it) and the request scheduler
+# keeps its production limits, so the numbers include queueing for quota.
+# --no-quota opens both wide, as bench.py does, to measure the app alone.
+#
+# "sessions" in the report is the mean number of users active at once, which
+# is what a worker has to carry at that arrival rate.
+
+import argparse
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import advice
+import fakes
+import storage
+from bench import ADMIN, APP, PASSWORD, Bench, parse_size
+
+# Google Sheets API: read and write requests per minute per user
+QUOTA_PER_MINUTE = 60
+
+@contextmanager
+def captured(*targets):
+    """Patch module.name factories to remember what they build: {name: [objects]}."""
+    built = {name: [] for _, name in targets}
+    saved = [(module, name, getattr(module, name)) for module, name in targets]
+    for module, name, original in saved:
+        def factory(*args, _original=original, _name=name, **kwargs):
+            obj = _original(*args, **kwargs)
+            built[_name].append(obj)
+            return obj
+        setattr(module, name, factory)
+    try:
+        yield built
+    finally:
+        for module, name, original in saved:
+            setattr(module, name, original)
+
+
+@contextmanager
+def shared_runtime(settings):
+    """Let AppTest sessions run side by side.
+
+    AppTest assumes one session at a time: each run installs and then removes a
+    process-wide mock Runtime, swaps st.secrets and compiles the script afresh.
+    Here every session sees the same Runtime (so the same caches, as on a real
+    server), the same secrets, and one compiled copy of the script.
+    """
+    from unittest.mock import MagicMock
+
+    import streamlit as st
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    secrets = Secrets()
+    secrets._secrets = dict(settings)
+    script_cache, compile_lock = ScriptCache(), threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def shared_bytecode(self, path):
+        with compile_lock:  # concurrent ast.parse can trip CPython 3.11
+            return get_bytecode(script_cache, path)
+
+    saved = (Runtime.__dict__["instance"], Runtime.__dict__["exists"], st.secrets, get_bytecode,
+             config.get_option("global.appTest"))
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    st.secrets = secrets
+    ScriptCache.get_bytecode = shared_bytecode
+    config.set_option("global.appTest", True)  # AppTest patches and restores it around each run
+    try:
+        yield
+    finally:
+        Runtime.instance, Runtime.exists, st.secrets, ScriptCache.get_bytecode = saved[:4]
+        config.set_option("global.appTest", saved[4])
+
+
+def _session():
+    from streamlit.testing.v1 import AppTest
+    return AppTest.from_file(APP, default_timeout=300)
+
+
+def _button(at, label, nth=0):
+    return [b for b in at.button if b.label == label][nth]
+
+
+class User(threading.Thread):
+    """One simulated session; appends (kind, step, seconds, outcome) to results."""
+
+    def __init__(self, bench, kind, think, rng, results):
+        super().__init__(daemon=True)
+        self.bench = bench
+        self.kind = kind
+        self.think = think
+        self.rng = rng
+        self.results = results
+        self.started = self.finished = None
+
+    def _step(self, step, action):
+        if self.think:
+            time.sleep(self.rng.expovariate(1 / self.think))
+        t = time.perf_counter()
+        try:
+            outcome = action() or "ok"
+        except Exception as e:
+            outcome = f"error: {type(e).__name__}: {e}"
+        self.results.append((self.kind, step, time.perf_counter() - t, outcome))
+        return not outcome.startswith("error")
+
+    def _check(self, at):
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    def run(self):
+        self.started = time.perf_counter()
+        at = _session()
+        try:
+            if self._step("open", lambda: self._check(at.run())):
+                (self._farmer if self.kind == "farmer" else self._corp)(at)
+        finally:
+            self.finished = time.perf_counter()
+
+    def _farmer(self, at):
+        slots = self.bench.data["Slots"]
+        farmer = slots.iloc[self.rng.randrange(len(slots))]
+
+        def login():
+            at.text_input[0].input(farmer["Farmer_Mobile"])
+            at.text_input[1].input(PASSWORD)
+            self._check(_button(at, "Login").click().run())
+            if at.session_state["user"] != "farmer":
+                raise RuntimeError("login failed")
+
+        def book():
+            # Past the generated bookings (which fill the next two weeks), so most requests fit
+            at.date_input[0].set_value(date.today() + timedelta(days=self.rng.randint(15, 45)))
+            at.number_input[0].set_value(float(self.rng.randint(1, 20)))
+            self._check(_button(at, "Book Slot").click().run())
+            return "ok" if any("booked" in s.value for s in at.success) else "full"
+
+        if self._step("login", login) and self._step("book", book):
+            self._step("view", lambda: self._check(at.run()))
+
+    def _corp(self, at):
+        slots = self.bench.data["Slots"]
+        name = slots["Farmer_Name"].iloc[self.rng.randrange(len(slots))]
+
+        def login():
+            at.text_input[2].input(ADMIN)
+            at.text_input[3].input(PASSWORD)
+            self._check(_button(at, "Login", 1).click().run())
+            if at.session_state["user"] != "corp":
+                raise RuntimeError("login failed")
+
+        def pay():
+            at.selectbox(key="status_update").set_value("paid")
+            self._check(at.button(key="corp_status_btn").click().run())
+
+        if (self._step("login", login)
+                and self._step("filter", lambda: self._check(
+                    next(s for s in at.selectbox if s.label == "Farmer").set_value(name).run()))
+                and self._step("select", lambda: self._check(at.checkbox(key="select_all_slots").check().run()))):
+            self._step("pay", pay)
+
+
+def run_load(bench, rate, duration, corp_share=0.1, think=0.0, max_sessions=500, seed=1):
+    """Open-loop arrivals at `rate` users/s for `duration` s; returns (step results, users, wall seconds)."""
+    rng = random.Random(seed)
+    results, users = [], []
+    started = time.perf_counter()
+    next_arrival = started
+    while next_arrival - started < duration:
+        time.sleep(max(0.0, next_arrival - time.perf_counter()))
+        active = sum(1 for u in users if u.is_alive())
+        if active < max_sessions:
+            user = User(bench, "corp" if rng.random() < corp_share else "farmer", think,
+                        random.Random(rng.random()), results)
+            users.append(user)
+            user.start()
+        else:
+            results.append(("-", "arrival", 0.0, "rejected: too many sessions"))
+        next_arrival += rng.expovariate(rate)
+    for user in users:
+        user.join()
+    return results, users, time.perf_counter() - started
+
+
+def report(results, users, wall, counters):
+    """Summary dict plus a per-step latency table (ms)."""
+    df = pd.DataFrame(results, columns=["kind", "step", "seconds", "outcome"])
+    errors = df["outcome"].str.startswith(("error", "rejected"))
+    steps = df[~errors].groupby(["kind", "step"], sort=False)["seconds"]
+    table = pd.DataFrame({
+        "reruns": steps.size(),
+        "p50_ms": steps.quantile(0.50) * 1000,
+        "p95_ms": steps.quantile(0.95) * 1000,
+        "p99_ms": steps.quantile(0.99) * 1000,
+        "max_ms": steps.max() * 1000,
+    }).round(1)
+    busy = sum((u.finished or u.started) - u.started for u in users if u.started)
+    latencies = df.loc[~errors, "seconds"].to_numpy()
+    summary = {
+        "users": len(users),
+        "reruns": int((~errors).sum()),
+        "errors": int(errors.sum()),
+        "full": int((df["outcome"] == "full").sum()),
+        "throughput": (~errors).sum() / wall,
+        "sessions": busy / wall,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000) if len(latencies) else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95) * 1000) if len(latencies) else 0.0,
+        "p99_ms": float(np.percentile(latencies, 99) * 1000) if len(latencies) else 0.0,
+        **counters,
+    }
+    return summary, table, df[errors].groupby(["kind", "step", "outcome"]).size()
+
+
+def _ratio(hits, misses):
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def counters(bench, built, before=None):
+    stores, caches, schedulers = built["open_store"], built["open_cache"], built["open_scheduler"]
+    now = {
+        "sheets_calls": bench.sheets.total,
+        "sheets_rejected": bench.sheets.rejected,
+        "openai_calls": bench.openai.total,
+        "store_hits": sum(s.hits for s in stores),
+        "store_misses": sum(s.misses for s in stores),
+        "advice_hits": sum(c.hits for c in caches),
+        "advice_misses": sum(c.misses for c in caches),
+        "coalesced": sum(s.coalesced for s in schedulers),
+    }
+    if before:
+        now = {k: v - before[k] for k, v in now.items()}
+    return now
+
+
+def step(bench, built, rate, args):
+    before = counters(bench, built)
+    results, users, wall = run_load(bench, rate, args.duration, args.corp_share, args.think, args.max_sessions)
+    c = counters(bench, built, before)
+    summary, table, errors = report(results, users, wall, {
+        "sheets_calls": c["sheets_calls"],
+        "sheets_rejected": c["sheets_rejected"],
+        "openai_calls": c["openai_calls"],
+        "store_hit_ratio": _ratio(c["store_hits"], c["store_misses"]),
+        "advice_hit_ratio": _ratio(c["advice_hits"], c["advice_misses"]),
+        "coalesced": c["coalesced"],
+    })
+    print(f"\nrate {rate:g} users/s: {summary['users']} users, {summary['reruns']} reruns "
+          f"({summary['throughput']:.1f}/s), {summary['sessions']:.1f} sessions active on average, "
+          f"{summary['errors']} errors, {summary['full']} bookings refused (slot full)")
+    print(f"  latency p50 {summary['p50_ms']:.0f} / p95 {summary['p95_ms']:.0f} / p99 {summary['p99_ms']:.0f} ms   "
+          f"Sheets {summary['sheets_calls']} calls ({summary['coalesced']} coalesced, "
+          f"{summary['sheets_rejected']} over quota)   "
+          f"OpenAI {summary['openai_calls']} calls   cache hits: store {summary['store_hit_ratio']:.0%}, "
+          f"advice {summary['advice_hit_ratio']:.0%}")
+    print(table.to_string())
+    if len(errors):
+        print(errors.head(5).to_string())
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="loadtest.py")
+    parser.add_argument("--slots", default="10k", help="synthetic bookings to start from")
+    parser.add_argument("--backend", choices=["sqlite", "mirror", "sheets"], default="mirror")
+    parser.add_argument("--rate", type=float, default=1.0, help="arriving users per second")
+    parser.add_argument("--ramp", help="comma-separated rates to step through instead of --rate")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of arrivals per rate")
+    parser.add_argument("--corp-share", type=float, default=0.1, help="fraction of users that are corporate")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds a user waits between steps")
+    parser.add_argument("--max-sessions", type=int, default=500)
+    parser.add_argument("--slo", type=float, default=1000, help="p95 rerun latency (ms) a rate must stay under")
+    parser.add_argument("--quota", action=argparse.BooleanOptionalAction,
+                        help=f"fake Sheet limited to {QUOTA_PER_MINUTE} requests/min and the scheduler at its "
+                             "defaults (default: on for mirror and sheets)")
+    args = parser.parse_args()
+    quota = args.backend != "sqlite" if args.quota is None else args.quota
+
+    import logging
+    logging.disable(logging.WARNING)  # AppTest runs without a server and says so on every rerun
+    bench = Bench(parse_size(args.slots), args.backend, quota_per_minute=QUOTA_PER_MINUTE if quota else None)
+    targets = [(storage, "open_store"), (storage, "open_scheduler"), (advice, "open_cache")]
+    try:
+        with fakes.installed(bench.sheets, bench.openai), shared_runtime(bench.settings), \
+                captured(*targets) as built:
+            sustained = None
+            for rate in [float(r) for r in (args.ramp or str(args.rate)).split(",")]:
+                summary = step(bench, built, rate, args)
+                if summary["p95_ms"] > args.slo or summary["errors"] > 0.01 * max(1, summary["reruns"]):
+                    print(f"\nrate {rate:g} users/s breaks the {args.slo:g} ms p95 SLO or has errors")
+                    break
+                sustained = summary
+        if sustained:
+            print(f"\nOne worker sustains {sustained['sessions']:.1f} concurrent sessions "
+                  f"({sustained['throughput']:.1f} reruns/s) within p95 {args.slo:g} ms")
+    finally:
+        bench.close()
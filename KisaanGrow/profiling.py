@@ -0,0 +1,155 @@
+# KisaanGrow profiling — where does a slow rerun spend its time?
+#
+# The app opens a Run around each script rerun (and each fragment-only rerun);
+# functions decorated with @timed and blocks wrapped in span() add their
+# wall time to it. With no Run open — profiling off — a timed call costs one
+# thread-local lookup. Finished runs are plain dicts, shown in the admin
+# sidebar panel and appended to PROFILE_LOG as JSON lines. Summarize a log with:
+#     python profiling.py profile.jsonl
+
+import functools
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+_local = threading.local()
+
+
+class Run:
+    def __init__(self, page, kind="rerun"):
+        self.page = page
+        self.kind = kind
+        self.started = time.perf_counter()
+        self.spans = {}
+
+    def add(self, name, seconds):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def record(self, session=None):
+        return {
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "session": session,
+            "page": self.page,
+            "kind": self.kind,
+            "ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "spans": {name: {"n": n, "ms": round(s * 1000, 3)} for name, (n, s) in self.spans.items()},
+        }
+
+
+class _Span:
+    __slots__ = ("run", "name", "started")
+
+    def __init__(self, run, name):
+        self.run = run
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.run.add(self.name, time.perf_counter() - self.started)
+
+
+class _NoSpan:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def active():
+    return getattr(_local, "run", None)
+
+
+def start(page, kind="rerun"):
+    _local.run = Run(page, kind)
+    return _local.run
+
+
+def finish(session=None):
+    """Close this thread's Run and return its record (None if none was open)."""
+    run = getattr(_local, "run", None)
+    _local.run = None
+    return run.record(session) if run is not None else None
+
+
+def span(name):
+    """with span("chart"): ... — timed into the open Run, free when there is none."""
+    run = getattr(_local, "run", None)
+    return _NO_SPAN if run is None else _Span(run, name)
+
+
+def timed(name):
+    """Decorator: time every call of the function as span `name`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            run = getattr(_local, "run", None)
+            if run is None:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                run.add(name, time.perf_counter() - started)
+        return inner
+    return wrap
+
+
+class JsonlLog:
+    """Append-only JSON lines file shared by every session of the process."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def read_log(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def summarize(records):
+    """Per page and span: reruns, calls and ms per rerun, p95 and total ms. Span "(total)" is the whole rerun."""
+    import pandas as pd
+
+    rows = []
+    for r in records:
+        rows.append((r["page"], "(total)", 1, r["ms"]))
+        rows.extend((r["page"], name, s["n"], s["ms"]) for name, s in r["spans"].items())
+    if not rows:
+        return pd.DataFrame(columns=["page", "span", "reruns", "calls", "mean_ms", "p95_ms", "total_ms"])
+    df = pd.DataFrame(rows, columns=["page", "span", "calls", "ms"])
+    reruns = pd.Series([r["page"] for r in records]).value_counts()
+    out = df.groupby(["page", "span"]).agg(
+        calls=("calls", "sum"), p95_ms=("ms", lambda s: s.quantile(0.95)), total_ms=("ms", "sum"),
+    ).reset_index()
+    out.insert(2, "reruns", out["page"].map(reruns))
+    # Averages are per rerun of the page, including reruns that never hit the span
+    out["calls"] = out["calls"] / out["reruns"]
+    out.insert(4, "mean_ms", out["total_ms"] / out["reruns"])
+    return out.sort_values(["page", "total_ms"], ascending=[True, False]).round(2).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python profiling.py profile.jsonl")
+    import pandas as pd
+    with pd.option_context("display.width", 200, "display.max_rows", None):
+        print(summarize(read_log(sys.argv[1])).to_string(index=False))
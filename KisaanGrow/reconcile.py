@@ -0,0 +1,106 @@
+# KisaanGrow payment reconciliation — match a bank / UPI settlement file to pending Slots
+#
+# A statement row pays a slot when the mobile matches the farmer, the amount is
+# Quantity x PRICE_PER_TONNE (within RECONCILE_TOLERANCE rupees), and the
+# payment date falls on the delivery date or up to RECONCILE_DAYS after it.
+# Matching is a single merge on mobile plus column-wise filters; only pairs that
+# are one-to-one in both directions are applied, everything else is reported.
+#     python reconcile.py settlement.csv [--apply]
+
+import argparse
+
+import pandas as pd
+
+import schema
+
+SLOTS = "Slots"
+
+# Accepted statement headers, compared lower-case without spaces/underscores
+ALIASES = {
+    "Mobile": ["mobile", "farmermobile", "payermobile", "phone", "vpa", "upiid"],
+    "Date": ["date", "txndate", "valuedate", "transactiondate", "settlementdate"],
+    "Amount": ["amount", "credit", "txnamount", "creditamount"],
+}
+
+
+def _columns(df):
+    found = {}
+    for col in df.columns:
+        key = str(col).lower().replace(" ", "").replace("_", "")
+        for name, aliases in ALIASES.items():
+            if key in aliases and name not in found:
+                found[name] = col
+    missing = [name for name in ALIASES if name not in found]
+    if missing:
+        raise ValueError(f"Statement is missing columns: {', '.join(missing)}")
+    return found
+
+
+def load_statement(source):
+    """Statement rows with normalized Mobile, parsed Date and numeric Amount (original columns kept)."""
+    raw = pd.read_csv(source, dtype=str, keep_default_na=False)
+    cols = _columns(raw)
+    return raw.assign(
+        _mobile=schema.mobile_series(raw[cols["Mobile"]]).astype(object),
+        _date=pd.to_datetime(raw[cols["Date"]], dayfirst=True, errors="coerce", format="mixed").dt.normalize(),
+        _amount=pd.to_numeric(raw[cols["Amount"]].str.replace(r"[^\d.\-]", "", regex=True), errors="coerce"),
+    )
+
+
+def match(statement, slots, price, tolerance=1.0, days=3):
+    """Returns (matched, unmatched, ambiguous). matched has a slot_id column per statement row."""
+    pending = slots[slots["Payment_Status"].astype(str).str.lower() != "paid"]
+    pending = pd.DataFrame({
+        "slot_id": pending.index,
+        "_mobile": schema.mobile_series(pending["Farmer_Mobile"]).astype(object).to_numpy(),
+        "_slot_date": pd.to_datetime(pending["Date"].astype(str), format="%Y-%m-%d", errors="coerce").to_numpy(),
+        "_expected": (pd.to_numeric(pending["Quantity"], errors="coerce") * price).to_numpy(),
+    })
+    stmt = statement.rename_axis("_line").reset_index()
+    pairs = stmt[["_line", "_mobile", "_date", "_amount"]].merge(pending, on="_mobile")
+    lag = (pairs["_date"] - pairs["_slot_date"]).dt.days
+    pairs = pairs[lag.between(0, days) & ((pairs["_amount"] - pairs["_expected"]).abs() <= tolerance)]
+
+    per_line = pairs.groupby("_line")["slot_id"].transform("size")
+    per_slot = pairs.groupby("slot_id")["_line"].transform("size")
+    unique = pairs[(per_line == 1) & (per_slot == 1)]
+    candidates = pairs[~pairs["_line"].isin(unique["_line"])].groupby("_line")["slot_id"].agg(list)
+
+    visible = [c for c in statement.columns if not c.startswith("_")]
+    matched = statement.loc[unique["_line"], visible].assign(slot_id=unique["slot_id"].to_numpy())
+    ambiguous = statement.loc[candidates.index.to_numpy(), visible].assign(candidates=candidates.to_numpy())
+    unmatched = statement.loc[~statement.index.isin(pairs["_line"]), visible]
+    return matched, unmatched, ambiguous
+
+
+def reconcile(store, source, settings, apply=False):
+    """Match a statement against pending Slots; with apply, mark the matches paid in one batched write."""
+    statement = load_statement(source)
+    slots, _ = store.query(SLOTS, where={"Payment_Status": "pending"})
+    matched, unmatched, ambiguous = match(
+        statement, slots,
+        price=float(settings.get("PRICE_PER_TONNE", 3550)),
+        tolerance=float(settings.get("RECONCILE_TOLERANCE", 1.0)),
+        days=int(settings.get("RECONCILE_DAYS", 3)),
+    )
+    if apply and len(matched):
+        store.update(SLOTS, {int(rid): {"Payment_Status": "paid"} for rid in matched["slot_id"]})
+    return matched, unmatched, ambiguous
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="reconcile.py")
+    parser.add_argument("statement")
+    parser.add_argument("--apply", action="store_true", help="mark matched slots paid")
+    args = parser.parse_args()
+
+    import storage
+    from config import load_secrets
+    settings = load_secrets()
+    store = storage.open_store(settings, storage.sheets_client(settings), journal_name="reconcile")
+    matched, unmatched, ambiguous = reconcile(store, args.statement, settings, apply=args.apply)
+    print(f"{len(matched)} matched{' and marked paid' if args.apply else ''}, "
+          f"{len(ambiguous)} ambiguous, {len(unmatched)} unmatched")
+    for title, df in [("Ambiguous", ambiguous), ("Unmatched", unmatched)]:
+        if len(df):
+            print(f"\n{title}:\n{df.to_string()}")
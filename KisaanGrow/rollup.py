@@ -0,0 +1,223 @@
+# KisaanGrow KPI rollups — per (date, time window) aggregates kept up to date on every write
+#
+# The corporate dashboard reads tonnes, bookings, paid/pending counts and unique
+# farmers from these tables instead of scanning the whole Slots history.
+# RollupStore wraps a store and applies each append/update to the rollup as a
+# delta (old row contribution out, new one in).
+
+import sqlite3
+import threading
+
+SLOTS = "Slots"
+
+# Above this many separate id runs an update reads the whole frame instead
+MAX_ID_RANGES = 200
+
+
+def _day(value):
+    # Cached Slots frames carry parsed dates (schema.apply); rollup keys stay 'YYYY-MM-DD'
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d") if value == value else ""  # NaT for unparseable dates
+    return str(value)
+
+
+def id_ranges(ids):
+    """Sorted ids as inclusive (first, last) runs, for read(rows=...)."""
+    ranges = []
+    for i in sorted({int(i) for i in ids}):
+        if ranges and i == ranges[-1][1] + 1:
+            ranges[-1][1] = i
+        else:
+            ranges.append([i, i])
+    return [tuple(r) for r in ranges]
+
+
+def _qty(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class SlotRollup:
+    def __init__(self, path):
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS slot_rollup "
+            "(date TEXT, slot TEXT, tonnes REAL, bookings INTEGER, paid INTEGER, pending INTEGER, "
+            "PRIMARY KEY (date, slot))"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS slot_rollup_farmers "
+            "(date TEXT, slot TEXT, mobile TEXT, bookings INTEGER, PRIMARY KEY (date, slot, mobile))"
+        )
+
+    def _apply(self, rows, sign, limit=None):
+        totals = {}
+        farmers = {}
+        for r in rows:
+            key = (_day(r.get("Date", "")), str(r.get("Time", "")))
+            paid = str(r.get("Payment_Status", "")).lower() == "paid"
+            t = totals.setdefault(key, [0.0, 0, 0, 0])
+            t[0] += sign * _qty(r.get("Quantity"))
+            t[1] += sign
+            t[2] += sign if paid else 0
+            t[3] += 0 if paid else sign
+            fkey = key + (str(r.get("Farmer_Mobile", "")),)
+            farmers[fkey] = farmers.get(fkey, 0) + sign
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if limit is not None:
+                    # Check-and-reserve under SQLite's write lock, so concurrent
+                    # sessions (and other processes) cannot overbook a window
+                    for (date, slot), t in totals.items():
+                        booked = self.conn.execute(
+                            "SELECT tonnes FROM slot_rollup WHERE date = ? AND slot = ?", (date, slot)
+                        ).fetchone()
+                        if (booked[0] if booked else 0.0) + t[0] > limit(slot) + 1e-9:
+                            self.conn.execute("ROLLBACK")
+                            return False
+                self.conn.executemany(
+                    "INSERT INTO slot_rollup VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (date, slot) DO UPDATE SET "
+                    "tonnes = tonnes + excluded.tonnes, bookings = bookings + excluded.bookings, "
+                    "paid = paid + excluded.paid, pending = pending + excluded.pending",
+                    [k + tuple(v) for k, v in totals.items()],
+                )
+                self.conn.executemany(
+                    "INSERT INTO slot_rollup_farmers VALUES (?, ?, ?, ?) ON CONFLICT (date, slot, mobile) "
+                    "DO UPDATE SET bookings = bookings + excluded.bookings",
+                    [k + (v,) for k, v in farmers.items()],
+                )
+                if sign < 0:
+                    self.conn.executemany(
+                        "DELETE FROM slot_rollup_farmers WHERE date = ? AND slot = ? AND mobile = ? AND bookings <= 0",
+                        list(farmers),
+                    )
+                    self.conn.executemany(
+                        "DELETE FROM slot_rollup WHERE date = ? AND slot = ? AND bookings <= 0", list(totals)
+                    )
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return True
+
+    def add(self, rows):
+        self._apply(rows, 1)
+
+    def remove(self, rows):
+        self._apply(rows, -1)
+
+    def reserve(self, rows, limit):
+        """Add rows only if every (date, window) stays within limit(window) tonnes."""
+        return self._apply(rows, 1, limit)
+
+    def tonnes(self, date, slot):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT tonnes FROM slot_rollup WHERE date = ? AND slot = ?", (date, slot)
+            ).fetchone()
+        return row[0] if row else 0.0
+
+    def rebuild(self, df):
+        """Recompute everything from a full Slots DataFrame."""
+        with self.lock:
+            self.conn.execute("DELETE FROM slot_rollup")
+            self.conn.execute("DELETE FROM slot_rollup_farmers")
+            if len(df):
+                self.add(df.to_dict("records"))
+
+    def is_empty(self):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM slot_rollup LIMIT 1").fetchone() is None
+
+    def totals(self, date_from, date_to=None):
+        """Aggregates over an inclusive date range of 'YYYY-MM-DD' strings."""
+        date_to = date_to or date_from
+        with self.lock:
+            tonnes, bookings, paid, pending = self.conn.execute(
+                "SELECT COALESCE(SUM(tonnes), 0), COALESCE(SUM(bookings), 0), COALESCE(SUM(paid), 0), "
+                "COALESCE(SUM(pending), 0) FROM slot_rollup WHERE date BETWEEN ? AND ?",
+                (date_from, date_to),
+            ).fetchone()
+            farmers = self.conn.execute(
+                "SELECT COUNT(DISTINCT mobile) FROM slot_rollup_farmers WHERE date BETWEEN ? AND ?",
+                (date_from, date_to),
+            ).fetchone()[0]
+        return {"tonnes": round(tonnes, 3), "bookings": bookings, "paid": paid, "pending": pending, "farmers": farmers}
+
+    def by_window(self, date):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT slot, tonnes, bookings, paid, pending FROM slot_rollup WHERE date = ?", (date,)
+            ).fetchall()
+        return {r[0]: {"tonnes": r[1], "bookings": r[2], "paid": r[3], "pending": r[4]} for r in rows}
+
+
+class RollupStore:
+    """Store wrapper that keeps a SlotRollup in step with writes to Slots."""
+
+    def __init__(self, store, rollup):
+        self.store = store
+        self.rollup = rollup
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def read(self, sheet, columns=None, rows=None):
+        return self.store.read(sheet, columns=columns, rows=rows)
+
+    def version(self, sheet):
+        return self.store.version(sheet)
+
+    def headers(self, sheet):
+        return self.store.headers(sheet)
+
+    def append(self, sheet, rows):
+        ids = self.store.append(sheet, rows)
+        if sheet == SLOTS:
+            self.rollup.add(rows)
+        return ids
+
+    def book(self, row, limit):
+        """Append one booking if its window has capacity left; returns the row id or None.
+
+        The id is 0 when the store assigns none yet (Google Sheets backend: the row is journaled)."""
+        if not self.rollup.reserve([row], limit):
+            return None
+        try:
+            ids = self.store.append(SLOTS, [row])
+        except BaseException:
+            self.rollup.remove([row])
+            raise
+        return ids[0] if ids else 0
+
+    def book_many(self, rows, limit):
+        """book() for a batch: each row is checked on its own, the accepted ones go out in one append.
+
+        Returns a row id per row (0 as in book()), None where the window was full."""
+        accepted = [self.rollup.reserve([row], limit) for row in rows]
+        booked = [row for row, ok in zip(rows, accepted) if ok]
+        try:
+            ids = self.store.append(SLOTS, booked) if booked else []
+        except BaseException:
+            self.rollup.remove(booked)
+            raise
+        ids = iter(ids if len(ids) == len(booked) else [0] * len(booked))
+        return [next(ids) if ok else None for ok in accepted]
+
+    def update(self, sheet, changes):
+        if sheet != SLOTS:
+            return self.store.update(sheet, changes)
+        # Only the changed rows' old values are needed; a large selection reads the whole frame once
+        ranges = id_ranges(changes)
+        df = self.store.read(sheet, rows=ranges if len(ranges) <= MAX_ID_RANGES else None)
+        known = [rid for rid in changes if rid in df.index]
+        before = df.loc[known].to_dict("records")
+        self.store.update(sheet, changes)
+        after = [dict(r, **changes[rid]) for rid, r in zip(known, before)]
+        self.rollup.remove(before)
+        self.rollup.add(after)
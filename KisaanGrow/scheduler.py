@@ -0,0 +1,132 @@
+# KisaanGrow Sheets request scheduler — keeps a rush of sessions inside the API quota
+#
+# Every Google Sheets call made by storage.SheetsStore goes through call():
+# it takes a token from a shared bucket (Google allows ~60 requests per minute
+# per user) and retries quota / server errors with jittered exponential backoff.
+# single_flight() coalesces identical requests: when twenty sessions miss the
+# cache at once, one of them downloads the sheet and the rest share its result.
+
+import logging
+import random
+import threading
+import time
+
+log = logging.getLogger("kisaangrow.scheduler")
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+# Errors only reach these from gspread calls, so the imports below are already
+# loaded by then; importing them up front would cost SQLite-only setups ~0.2 s.
+def status_of(error):
+    import gspread
+    return error.code if isinstance(error, gspread.exceptions.APIError) else None
+
+
+def retriable(error):
+    """Quota, server and network errors are worth another try."""
+    import requests
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    return status_of(error) in RETRY_STATUS
+
+
+def quota_only(error):
+    """For writes: only retry requests the API is known to have rejected."""
+    return status_of(error) == 429
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute=60, burst=10):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestScheduler:
+    def __init__(self, rate_per_minute=60, burst=10, retries=5, base_delay=1.0, max_delay=32.0):
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self._flights = {}
+        self.calls = 0
+        self.retried = 0
+        self.coalesced = 0
+
+    def call(self, fn, *args, retry_on=retriable, **kwargs):
+        """Rate-limited fn(*args, **kwargs), retried with full-jitter backoff."""
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            self.calls += 1
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.retries or not retry_on(e):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                attempt += 1
+                self.retried += 1
+                log.warning("Sheets request failed (%s), retry %d in %.1fs", e, attempt, delay)
+                time.sleep(delay)
+
+    def in_flight(self, key):
+        with self.lock:
+            return key in self._flights
+
+    def single_flight(self, key, fn, *args):
+        """Run fn once per key at a time; concurrent callers wait for and share its outcome."""
+        with self.lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn(*args)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+def open_scheduler(settings):
+    return RequestScheduler(
+        rate_per_minute=float(settings.get("SHEETS_RATE_PER_MIN", 60)),
+        burst=int(settings.get("SHEETS_BURST", 10)),
+        retries=int(settings.get("SHEETS_RETRIES", 5)),
+    )
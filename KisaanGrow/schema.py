@@ -0,0 +1,71 @@
+# KisaanGrow sheet schemas — explicit, compact dtypes for the cached DataFrames
+#
+# Without a schema every column is whatever get_all_records / SQLite handed back:
+# Mobile flips between int and str, dates are plain strings and repeated values
+# like Time or Payment_Status are one Python string per row. apply() fixes that
+# once when a sheet is loaded, so pages can compare columns directly.
+
+import pandas as pd
+
+# Columns never kept in cached frames; only the login index reads them
+SENSITIVE = {"Password", "Aadhar"}
+
+SCHEMAS = {
+    "Slots": {
+        "Date": "date",
+        "Time": "category",
+        "Quantity": "float",
+        "Farmer_Mobile": "mobile",
+        "Farmer_Name": "category",
+        "Payment_Status": "category",
+    },
+    "Farmers": {
+        "Name": "string",
+        "Mobile": "mobile",
+        "Village": "category",
+    },
+    "Corporates": {
+        "Name": "string",
+        "Corp_ID": "key",
+        "Role": "category",
+    },
+}
+
+# Arrow-backed strings: one contiguous buffer instead of a Python object per row
+STRING = "string[pyarrow]"
+
+
+def mobile_series(s):
+    """Vectorized storage.normalize_mobile: last 10 digits, as a compact string."""
+    text = s.astype(str).str.strip().str.replace(r"\.0$", "", regex=True)
+    return text.str.replace(r"\D", "", regex=True).str[-10:].astype(STRING)
+
+
+def _cast(s, kind):
+    if kind == "date":
+        return s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
+    if kind == "float":
+        return pd.to_numeric(s, errors="coerce")
+    if kind == "category":
+        return s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype(str).astype("category")
+    if kind == "mobile":
+        return s if s.dtype == STRING else mobile_series(s)
+    if kind in ("string", "key"):
+        return s if s.dtype == STRING else s.astype(str).str.strip().astype(STRING)
+    return s
+
+
+def apply(sheet, df, drop_sensitive=True):
+    """Return df with the sheet's dtypes (idempotent); unknown columns are left alone."""
+    if df is None or df.empty and not len(df.columns):
+        return df
+    if drop_sensitive:
+        df = df.drop(columns=[c for c in df.columns if c in SENSITIVE])
+    types = SCHEMAS.get(sheet, {})
+    casts = {col: _cast(df[col], kind) for col, kind in types.items() if col in df.columns}
+    return df.assign(**casts) if casts else df
+
+
+def date_str(s):
+    """Typed Date column back to 'YYYY-MM-DD' strings (for labels and equality with inputs)."""
+    return s.dt.strftime("%Y-%m-%d") if pd.api.types.is_datetime64_any_dtype(s) else s.astype(str)
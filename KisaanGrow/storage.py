@@ -0,0 +1,1140 @@
+# KisaanGrow storage layer — local SQLite primary store with optional Google Sheets mirror
+#
+# Every store speaks the same small API, so the app never cares where rows live:
+#   read(sheet)                 -> DataFrame indexed by stable row id (1 = first data row)
+#   read(sheet, columns=[...], rows=[(first, last), ...]) -> only those columns / row id ranges
+#   append(sheet, [row_dict])   -> list of new row ids
+#   update(sheet, {row_id: {column: value}})
+#   version(sheet)              -> cheap token that changes whenever the sheet's rows change
+#   query(sheet, where=..., order_by=..., limit=..., offset=...) -> (page DataFrame, total matches)
+#   distinct(sheet, column)     -> sorted distinct values, for filter dropdowns
+#   delete(sheet, [row_id])     -> SQLite only; used to move old bookings to the archive
+#
+# Row ids line up with Google Sheets: row id N lives on sheet row N + 1 (row 1 = header).
+# gspread is imported where the Sheets code needs it, so SQLite-only setups never load it.
+
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import schema
+from archive import open_archive
+from journal import WriteJournal
+from rollup import RollupStore, SlotRollup
+from scheduler import RequestScheduler, open_scheduler, quota_only
+
+log = logging.getLogger("kisaangrow.storage")
+
+ROW_ID = "_row"
+INDEXED_COLUMNS = ["Mobile", "Corp_ID", "Date", "Farmer_Mobile"]
+# Identifiers that look like numbers; stored as TEXT so "9000000001" matches however the row arrived
+TEXT_COLUMNS = ["Mobile", "Corp_ID", "Farmer_Mobile", "Aadhar"]
+
+# Columns that get edited in place on existing rows; delta sync re-checks them every refresh
+WATCHED_COLUMNS = {"Slots": ["Payment_Status"]}
+
+# Sheets column holding each appended row's key (the SQLite row id when mirroring,
+# a journal key otherwise). A retried append skips keys already present, and
+# mirror updates find their row by key, so neither depends on the Sheet's row order.
+WRITE_ID = "Write_ID"
+
+
+def _q(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _column_def(name):
+    return f"{_q(name)} TEXT" if name in TEXT_COLUMNS else _q(name)
+
+
+def _cell(col, value):
+    # Sheets hands back 9000000001 (or 9000000001.0) for a mobile; keep identifiers as text
+    if col in TEXT_COLUMNS and value is not None and value != "":
+        return normalize_key(value)
+    return value
+
+
+def _sort_key(value):
+    return (isinstance(value, str), value)
+
+
+def query_frame(df, where=None, order_by=None, descending=False, limit=None, offset=0, columns=None,
+                between=None, after=None, count=True):
+    """query() for stores without a query engine: filter/sort/page an in-memory frame."""
+    for col, value in (where or {}).items():
+        if col not in df.columns:
+            return df.iloc[0:0], 0 if count else None
+        df = df[df[col] == value]
+    for col, (low, high) in (between or {}).items():
+        if col not in df.columns:
+            return df.iloc[0:0], 0 if count else None
+        values = df[col].astype(str)
+        keep = pd.Series(True, index=df.index)
+        if low is not None:
+            keep &= values >= str(low)
+        if high is not None:
+            keep &= values <= str(high)
+        df = df[keep.to_numpy()]
+    if after is not None:
+        df = df[df.index > after]
+    total = len(df) if count else None
+    if order_by in df.columns:
+        df = df.sort_values(order_by, ascending=not descending, kind="stable")
+    if limit is not None:
+        df = df.iloc[offset:offset + limit]
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df, total
+
+
+def project_frame(df, columns=None, rows=None):
+    """read(columns=, rows=) for stores that already hold the whole frame."""
+    if rows is not None:
+        mask = pd.Series(False, index=df.index)
+        for first, last in rows:
+            mask |= (df.index >= first) & (df.index <= last)
+        df = df[mask.to_numpy()]
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
+
+
+def extend_frame(df, added):
+    """df with added's rows after it, keeping df's dtypes.
+
+    A plain concat turns a categorical column into object as soon as added has
+    a value df has no category for, and re-typing that costs a pass over the
+    whole frame. Here added values are coded against the existing categories
+    (new ones are appended) and other columns are cast to df's dtypes.
+    """
+    columns = {}
+    for col in df.columns:
+        old, new = df[col], added[col]
+        if isinstance(old.dtype, pd.CategoricalDtype):
+            if not isinstance(new.dtype, pd.CategoricalDtype):
+                new = new.astype(str).astype("category")
+            # Recode through added's few categories rather than value by value
+            categories, dtype = old.cat.categories, old.dtype
+            unseen = new.cat.categories.difference(categories, sort=False)
+            if len(unseen):
+                categories = categories.append(unseen)
+                dtype = pd.CategoricalDtype(categories)
+            recode = np.append(categories.get_indexer(new.cat.categories), -1)  # code -1 (NaN) stays -1
+            codes = np.concatenate([old.cat.codes.to_numpy(), recode[new.cat.codes.to_numpy()]])
+            columns[col] = pd.Categorical.from_codes(codes, dtype=dtype, validate=False)
+            continue
+        if new.dtype != old.dtype:
+            try:
+                new = new.astype(old.dtype)
+            except (TypeError, ValueError):
+                pass
+        columns[col] = pd.concat([old, new], ignore_index=True).array
+    return pd.DataFrame(columns, index=df.index.append(added.index))
+
+
+def _row_filter(rows):
+    if rows is None:
+        return "", []
+    rows = list(rows)
+    if not rows:
+        return " WHERE 0", []
+    clause = " OR ".join(f"{ROW_ID} BETWEEN ? AND ?" for _ in rows)
+    return f" WHERE {clause}", [int(v) for pair in rows for v in pair]
+
+
+def distinct_frame(df, column):
+    if column not in df.columns:
+        return []
+    return sorted(df[column].dropna().unique().tolist(), key=_sort_key)
+
+
+# =========================================================
+# SQLITE (PRIMARY)
+# =========================================================
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._headers = {}
+        self._updates = {}  # sheet -> in-place edits made through this store
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def headers(self, sheet):
+        with self.lock:
+            if sheet not in self._headers:
+                info = self.conn.execute(f"PRAGMA table_info({_q(sheet)})").fetchall()
+                cols = [r[1] for r in info if r[1] != ROW_ID]
+                if not cols:
+                    return []
+                self._headers[sheet] = cols
+                self._text_keys(sheet, cols)
+            return list(self._headers[sheet])
+
+    def _text_keys(self, sheet, cols):
+        # Tables created before TEXT_COLUMNS may hold identifiers as numbers; convert them once
+        for col in TEXT_COLUMNS:
+            if col in cols:
+                self.conn.execute(
+                    f"UPDATE {_q(sheet)} SET {_q(col)} = CASE typeof({_q(col)}) "
+                    f"WHEN 'integer' THEN CAST({_q(col)} AS TEXT) "
+                    f"ELSE CAST(CAST({_q(col)} AS INTEGER) AS TEXT) END "
+                    f"WHERE typeof({_q(col)}) = 'integer' "
+                    f"OR (typeof({_q(col)}) = 'real' AND {_q(col)} = CAST({_q(col)} AS INTEGER))"
+                )
+
+    def version(self, sheet):
+        # max(rowid) is a B-tree lookup and also sees appends made by other processes
+        if not self.headers(sheet):
+            return None
+        with self.lock:
+            return self._updates.get(sheet, 0), self.conn.execute(f"SELECT MAX({ROW_ID}) FROM {_q(sheet)}").fetchone()[0]
+
+    def ensure(self, sheet, headers):
+        with self.lock:
+            existing = self.headers(sheet)
+            if not existing:
+                cols = ", ".join(_column_def(h) for h in headers)
+                self.conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {_q(sheet)} "
+                    f"({ROW_ID} INTEGER PRIMARY KEY AUTOINCREMENT, {cols})"
+                )
+            else:
+                for h in headers:
+                    if h not in existing:
+                        self.conn.execute(f"ALTER TABLE {_q(sheet)} ADD COLUMN {_column_def(h)}")
+            self._headers.pop(sheet, None)
+            for col in INDEXED_COLUMNS:
+                if col in self.headers(sheet):
+                    self.conn.execute(
+                        f"CREATE INDEX IF NOT EXISTS {_q(f'ix_{sheet}_{col}')} ON {_q(sheet)} ({_q(col)})"
+                    )
+
+    def read(self, sheet, columns=None, rows=None):
+        headers = self.headers(sheet)
+        if not headers:
+            return pd.DataFrame()
+        if columns is not None:
+            headers = [c for c in columns if c in headers]
+        cond, params = _row_filter(rows)
+        cols = "".join(", " + _q(h) for h in headers)
+        with self.lock:
+            found = self.conn.execute(
+                f"SELECT {ROW_ID}{cols} FROM {_q(sheet)}{cond} ORDER BY {ROW_ID}", params
+            ).fetchall()
+        return pd.DataFrame(
+            [r[1:] for r in found], columns=headers, index=pd.Index([r[0] for r in found])
+        )
+
+    def query(self, sheet, where=None, order_by=None, descending=False, limit=None, offset=0, columns=None,
+              between=None, after=None, count=True):
+        """(page, total) of the rows matching where ({column: value}) and between ({column: (low, high)},
+        inclusive, None for an open end). after: only row ids above it, for keyset paging without OFFSET.
+        count=False skips the COUNT(*) and returns None as the total."""
+        headers = self.headers(sheet)
+        if not headers:
+            return pd.DataFrame(), 0 if count else None
+        cols = headers if columns is None else [c for c in columns if c in headers]
+        clauses, params = [], []
+        for col, value in (where or {}).items():
+            if col not in headers:
+                return pd.DataFrame(columns=cols), 0 if count else None
+            clauses.append(f"{_q(col)} = ?")
+            params.append(_cell(col, value))
+        for col, (low, high) in (between or {}).items():
+            if col not in headers:
+                return pd.DataFrame(columns=cols), 0 if count else None
+            for op, bound in ((">=", low), ("<=", high)):
+                if bound is not None:
+                    clauses.append(f"{_q(col)} {op} ?")
+                    params.append(_cell(col, bound))
+        if after is not None:
+            clauses.append(f"{ROW_ID} > ?")
+            params.append(int(after))
+        cond = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = f"{_q(order_by)} {'DESC' if descending else 'ASC'}, " if order_by in headers else ""
+        sql = (
+            f"SELECT {', '.join([ROW_ID] + [_q(c) for c in cols])} FROM {_q(sheet)}{cond} "
+            f"ORDER BY {order}{ROW_ID}{' DESC' if descending and not order else ''}"
+        )
+        page_params = list(params)
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            page_params += [int(limit), int(offset)]
+        with self.lock:
+            rows = self.conn.execute(sql, page_params).fetchall()
+            total = self.conn.execute(f"SELECT COUNT(*) FROM {_q(sheet)}{cond}", params).fetchone()[0] if count else None
+        df = pd.DataFrame([r[1:] for r in rows], columns=cols, index=pd.Index([r[0] for r in rows]))
+        return df, total
+
+    def distinct(self, sheet, column):
+        if column not in self.headers(sheet):
+            return []
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT DISTINCT {_q(column)} FROM {_q(sheet)} WHERE {_q(column)} IS NOT NULL"
+            ).fetchall()
+        return sorted((r[0] for r in rows), key=_sort_key)
+
+    def append(self, sheet, rows):
+        if not rows:
+            return []
+        if not self.headers(sheet):
+            self.ensure(sheet, list(rows[0].keys()))
+        headers = self.headers(sheet)
+        sql = (
+            f"INSERT INTO {_q(sheet)} ({', '.join(_q(h) for h in headers)}) "
+            f"VALUES ({', '.join('?' for _ in headers)})"
+        )
+        ids = []
+        with self.transaction() as conn:
+            for r in rows:
+                ids.append(conn.execute(sql, [_cell(h, r.get(h, "")) for h in headers]).lastrowid)
+        return ids
+
+    def load(self, sheet, headers, rows, ids):
+        """Seed a table with rows that already have row ids (e.g. pulled from the mirror)."""
+        self.ensure(sheet, headers)
+        cols = ", ".join(_q(h) for h in [ROW_ID] + list(headers))
+        sql = f"INSERT OR REPLACE INTO {_q(sheet)} ({cols}) VALUES ({', '.join('?' for _ in range(len(headers) + 1))})"
+        with self.transaction() as conn:
+            conn.executemany(sql, ([i] + [_cell(h, r.get(h, "")) for h in headers] for i, r in zip(ids, rows)))
+
+    def update(self, sheet, changes):
+        headers = self.headers(sheet)
+        with self.transaction() as conn:
+            for row_id, values in changes.items():
+                for col in values:
+                    if col not in headers:
+                        raise KeyError(f"{sheet} has no column {col!r}")
+                sets = ", ".join(f"{_q(c)} = ?" for c in values)
+                conn.execute(
+                    f"UPDATE {_q(sheet)} SET {sets} WHERE {ROW_ID} = ?",
+                    [_cell(c, v) for c, v in values.items()] + [int(row_id)],
+                )
+            self._updates[sheet] = self._updates.get(sheet, 0) + 1
+
+    def delete(self, sheet, ids):
+        ids = [int(i) for i in ids]
+        with self.transaction() as conn:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                conn.execute(f"DELETE FROM {_q(sheet)} WHERE {ROW_ID} IN ({', '.join('?' for _ in chunk)})", chunk)
+            self._updates[sheet] = self._updates.get(sheet, 0) + 1
+
+
+# =========================================================
+# GOOGLE SHEETS
+# =========================================================
+
+def _col_letter(n):
+    from gspread.utils import rowcol_to_a1
+    return rowcol_to_a1(1, n)[:-1]
+
+
+class SheetsStore:
+    """Google Sheets backend with incremental (delta) sync.
+
+    The first read of a worksheet downloads it once; later reads fetch only the
+    rows appended since, plus the WATCHED_COLUMNS of known rows, in a single
+    batch_get. A full resync every `full_every` seconds (or whenever the header
+    row changes) picks up any other edits made by hand in the sheet.
+
+    All API calls go through a scheduler.RequestScheduler. Concurrent reads of
+    a sheet share one refresh, callers that already have a snapshot get it
+    straight back while the refresh runs, and a failed refresh serves the last
+    snapshot instead of raising. self.lock only guards the cached dicts and is
+    never held across an API call, so version() and stale reads never wait on
+    a refresh.
+
+    With keyed, update() takes mirror (SQLite) row ids and looks them up in the
+    WRITE_ID column; otherwise row ids are sheet positions. WRITE_ID itself is
+    never part of headers() or read().
+    """
+
+    def __init__(self, client, sheet_id, watch=None, full_every=600, ttl=20, scheduler=None, keyed=False):
+        self.client = client
+        self.keyed = keyed
+        self.scheduler = scheduler or RequestScheduler()
+        self.sheet_id = sheet_id
+        self.watch = WATCHED_COLUMNS if watch is None else watch
+        self.full_every = full_every
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self._sh = None
+        self._ws = {}
+        self._headers = {}
+        self._frames = {}
+        self._writes = {}  # sheet -> writes made through this store
+
+    def _call(self, fn, *args, **kwargs):
+        return self.scheduler.call(fn, *args, **kwargs)
+
+    def spreadsheet(self):
+        if self._sh is None:
+            self._sh = self._call(self.client.open_by_key, self.sheet_id)
+        return self._sh
+
+    def worksheet(self, name, create_headers=None):
+        ws = self._ws.get(name)
+        if ws is None:
+            ws = self.scheduler.single_flight(("worksheet", name), self._open_worksheet, name, create_headers)
+        return ws
+
+    def _open_worksheet(self, name, create_headers):
+        import gspread
+        sh = self.spreadsheet()
+        try:
+            ws = self._call(sh.worksheet, name)
+        except gspread.WorksheetNotFound:
+            if create_headers is None:
+                raise
+            ws = self._call(sh.add_worksheet, name, rows=500, cols=20, retry_on=quota_only)
+            self._call(ws.append_row, list(create_headers), retry_on=quota_only)
+        with self.lock:
+            return self._ws.setdefault(name, ws)
+
+    def _all_headers(self, sheet):
+        import gspread
+        with self.lock:
+            headers = self._headers.get(sheet)
+        if headers is None:
+            try:
+                headers = self._call(self.worksheet(sheet).row_values, 1)
+            except gspread.WorksheetNotFound:
+                return []
+            with self.lock:
+                headers = self._headers.setdefault(sheet, headers)
+        return list(headers)
+
+    def headers(self, sheet):
+        return [h for h in self._all_headers(sheet) if h != WRITE_ID]
+
+    def version(self, sheet):
+        # Remote edits can't be seen without a request, so the version ticks every ttl seconds.
+        # No lock: a dict read is atomic, and this must not wait on a refresh.
+        return self._writes.get(sheet, 0), int(time.monotonic() // self.ttl)
+
+    def invalidate(self, sheet):
+        with self.lock:
+            self._frames.pop(sheet, None)
+
+    def _frame(self, headers, rows, start):
+        from gspread.utils import numericise_all
+        width = len(headers)
+        records = [numericise_all((list(r) + [""] * width)[:width], default_blank="") for r in rows]
+        return pd.DataFrame(records, columns=headers, index=pd.RangeIndex(start, start + len(records)))
+
+    def read(self, sheet, columns=None, rows=None):
+        df = self._read(sheet, columns, rows)
+        return df.drop(columns=WRITE_ID) if WRITE_ID in df.columns else df
+
+    def _read(self, sheet, columns, rows):
+        import gspread
+        if columns is not None or rows is not None:
+            key = (
+                "range", sheet,
+                None if columns is None else tuple(columns),
+                None if rows is None else tuple((int(a), int(b)) for a, b in rows),
+            )
+            try:
+                return self.scheduler.single_flight(key, self._range_read, sheet, columns, rows)
+            except gspread.WorksheetNotFound:
+                return pd.DataFrame()
+        key = ("read", sheet)
+        with self.lock:
+            stale = self._frames.get(sheet)
+        if stale is not None and self.scheduler.in_flight(key):
+            return stale[0]
+        try:
+            return self.scheduler.single_flight(key, self._refresh, sheet)
+        except gspread.WorksheetNotFound:
+            return pd.DataFrame()
+        except Exception as e:
+            if stale is None:
+                raise
+            log.warning("Refreshing %s from Google Sheets failed, serving last snapshot: %s", sheet, e)
+            return stale[0]
+
+    def _refresh(self, sheet):
+        # single_flight runs one refresh per sheet at a time; the lock is only taken to read or swap state
+        with self.lock:
+            cached = self._frames.get(sheet)
+        if cached is None or time.monotonic() - cached[1] > self.full_every:
+            return self._full_read(sheet)
+        return self._delta_read(sheet, cached)
+
+    def _full_read(self, sheet):
+        values = self._call(self.worksheet(sheet).get, pad_values=True)
+        headers = values[0] if values and values[0] else []
+        df = self._frame(headers, values[1:], 1) if headers else pd.DataFrame()
+        with self.lock:
+            self._headers[sheet] = headers
+            self._frames[sheet] = (df, time.monotonic())
+        return df
+
+    def _range_read(self, sheet, columns, rows):
+        # One batch_get covering only the requested cells: each run of adjacent
+        # columns times each row range becomes a single A1 range
+        from gspread.utils import numericise_all
+        headers = self._all_headers(sheet)
+        wanted = [h for h in headers if h != WRITE_ID] if columns is None else [c for c in columns if c in headers]
+        if not wanted:
+            return pd.DataFrame()
+        positions = sorted(headers.index(c) + 1 for c in wanted)
+        runs = []
+        for pos in positions:
+            if runs and pos == runs[-1][1] + 1:
+                runs[-1][1] = pos
+            else:
+                runs.append([pos, pos])
+        spans = [(1, None)] if rows is None else [(int(a), int(b)) for a, b in rows]
+        ranges = [
+            f"{_col_letter(lo)}{a + 1}:{_col_letter(hi)}{'' if b is None else b + 1}"
+            for a, b in spans for lo, hi in runs
+        ]
+        result = self._call(self.worksheet(sheet).batch_get, ranges) if ranges else []
+        names = [headers[p - 1] for p in positions]
+        frames = []
+        for i, (a, b) in enumerate(spans):
+            parts = result[i * len(runs):(i + 1) * len(runs)]
+            n = max((len(v) for v in parts), default=0)
+            records = [[] for _ in range(n)]
+            for (lo, hi), values in zip(runs, parts):
+                width = hi - lo + 1
+                for j in range(n):
+                    r = list(values[j]) if j < len(values) else []
+                    records[j].extend((r + [""] * width)[:width])
+            frames.append(pd.DataFrame(
+                [numericise_all(r, default_blank="") for r in records],
+                columns=names, index=pd.RangeIndex(a, a + n),
+            ))
+        df = pd.concat(frames) if len(frames) > 1 else frames[0]
+        return df[wanted]
+
+    def _delta_read(self, sheet, cached):
+        from gspread.utils import numericise_all
+        df, loaded_at = cached
+        headers = list(df.columns)
+        n = len(df)
+        last = _col_letter(len(headers))
+        watched = [c for c in self.watch.get(sheet, []) if c in headers]
+        ranges = [f"A1:{last}1"]
+        for c in watched:
+            letter = _col_letter(headers.index(c) + 1)
+            ranges.append(f"{letter}2:{letter}{n + 1}")
+        ranges.append(f"A{n + 2}:{last}")
+        result = self._call(self.worksheet(sheet).batch_get, ranges)
+
+        if (list(result[0][0]) if result[0] else []) != headers:
+            return self._full_read(sheet)
+
+        patched = df
+        for c, values in zip(watched, result[1:-1]):
+            col = numericise_all([(r[0] if r else "") for r in values] + [""] * (n - len(values)), default_blank="")
+            fresh = pd.Series(col[:n], index=patched.index, dtype=object)
+            changed = patched[c].astype(object) != fresh
+            if changed.any():
+                if patched is df:
+                    patched = df.copy()
+                patched.loc[changed, c] = fresh[changed]
+
+        if result[-1]:
+            patched = pd.concat([patched, self._frame(headers, result[-1], n + 1)])
+        with self.lock:
+            # An edit of ours patched the snapshot meanwhile and may be newer than
+            # what was fetched; keep that one, the next refresh reconciles them
+            if self._frames.get(sheet) is cached:
+                self._frames[sheet] = (patched, loaded_at)
+        return patched
+
+    def append(self, sheet, rows, keys=None, verify=False):
+        """Append rows, writing keys to WRITE_ID. With verify (a retry of an append whose
+        outcome is unknown) rows whose key is already in the sheet are skipped."""
+        if not rows:
+            return []
+        create = list(rows[0].keys()) + ([WRITE_ID] if keys is not None else [])
+        ws = self.worksheet(sheet, create_headers=create)
+        headers = self._all_headers(sheet)
+        if keys is not None:
+            if WRITE_ID not in headers:
+                headers = self._add_key_column(sheet, ws, headers)
+            if verify:
+                present, _ = self._key_index(sheet)
+                todo = [(r, str(k)) for r, k in zip(rows, keys) if str(k) not in present]
+                if len(todo) < len(rows):
+                    log.info("%d rows were already appended to %s, not sending them again", len(rows) - len(todo), sheet)
+                rows, keys = [r for r, _ in todo], [k for _, k in todo]
+                if not rows:
+                    return []
+        values = [[r.get(h, "") for h in headers] for r in rows]
+        if keys is not None:
+            col = headers.index(WRITE_ID)
+            for v, k in zip(values, keys):
+                v[col] = str(k)
+        self._call(ws.append_rows, values, retry_on=quota_only)
+        with self.lock:
+            self._writes[sheet] = self._writes.get(sheet, 0) + 1
+        return []
+
+    def _add_key_column(self, sheet, ws, headers):
+        from gspread.utils import rowcol_to_a1
+        self._call(
+            ws.batch_update, [{"range": rowcol_to_a1(1, len(headers) + 1), "values": [[WRITE_ID]]}],
+            raw=False, retry_on=quota_only,
+        )
+        with self.lock:
+            self._headers[sheet] = headers + [WRITE_ID]
+            self._frames.pop(sheet, None)
+        return headers + [WRITE_ID]
+
+    def _key_index(self, sheet):
+        """({key: row id} from the WRITE_ID column, number of rows before the first keyed one or None)."""
+        headers = self._all_headers(sheet)
+        if WRITE_ID not in headers:
+            return {}, None
+        letter = _col_letter(headers.index(WRITE_ID) + 1)
+        values = self._call(self.worksheet(sheet).batch_get, [f"{letter}2:{letter}"])[0]
+        keys, legacy = {}, None
+        for i, v in enumerate(values):
+            if v and str(v[0]) != "":
+                keys[str(v[0])] = i + 1
+                if legacy is None:
+                    legacy = i
+        return keys, legacy
+
+    def mirror_ids(self, sheet, positions):
+        """Mirror ids of sheet rows: the id a keyed append wrote, else the row's position."""
+        keys, _ = self._key_index(sheet)
+        by_position = {pos: int(k) for k, pos in keys.items() if k.isdigit()}
+        return [by_position.get(int(p), int(p)) for p in positions]
+
+    def _locate(self, sheet, changes):
+        # Rows from before the key column keep their position; any other id must be found by key
+        keys, legacy = self._key_index(sheet)
+        located, missing = {}, []
+        for row_id, values in changes.items():
+            pos = keys.get(str(int(row_id)))
+            if pos is None and (legacy is None or int(row_id) <= legacy):
+                pos = int(row_id)
+            if pos is None:
+                missing.append(int(row_id))
+            else:
+                located[pos] = values
+        if missing:
+            raise LookupError(f"{len(missing)} rows of {sheet} have not reached the sheet yet: {missing[:5]}")
+        return located
+
+    def update(self, sheet, changes):
+        # Every changed cell goes out in one values.batchUpdate request
+        from gspread.utils import rowcol_to_a1
+        ws = self.worksheet(sheet)
+        headers = self._all_headers(sheet)
+        if self.keyed:
+            changes = self._locate(sheet, changes)
+        data = [
+            {"range": rowcol_to_a1(int(row_id) + 1, headers.index(col) + 1), "values": [[value]]}
+            for row_id, values in changes.items()
+            for col, value in values.items()
+        ]
+        if data:
+            self._call(ws.batch_update, data, raw=False)
+        self._patch(sheet, changes)
+
+    def _patch(self, sheet, changes):
+        # Keep the delta-sync snapshot in step with our own edits
+        with self.lock:
+            self._writes[sheet] = self._writes.get(sheet, 0) + 1
+            if sheet not in self._frames:
+                return
+            df, loaded_at = self._frames[sheet]
+            df = df.copy()
+            for row_id, values in changes.items():
+                for col, value in values.items():
+                    if int(row_id) in df.index and col in df.columns:
+                        df.at[int(row_id), col] = value
+            self._frames[sheet] = (df, loaded_at)
+
+
+# =========================================================
+# SQLITE + SHEETS MIRROR
+# =========================================================
+
+class MirroredStore:
+    """Serves everything from SQLite and copies writes to Sheets for the office.
+
+    With a journal, mirror writes are queued durably and flushed in batches by
+    its background worker instead of being sent inline.
+    """
+
+    def __init__(self, local, mirror, journal=None):
+        self.local = local
+        self.mirror = mirror
+        self.writer = journal or mirror
+        self.lock = threading.Lock()
+        self._seeded = set()
+
+    def _seed(self, sheet):
+        # First touch of a sheet: pull the existing Sheets data so row ids stay aligned
+        with self.lock:
+            if sheet in self._seeded:
+                return
+            if not self.local.headers(sheet):
+                try:
+                    headers = self.mirror.headers(sheet)
+                    if headers:
+                        df = self.mirror.read(sheet)
+                        ids = self.mirror.mirror_ids(sheet, df.index)
+                        self.local.load(sheet, headers, df.to_dict("records"), ids)
+                        self.mirror.invalidate(sheet)
+                except Exception as e:
+                    log.warning("Could not seed %s from Google Sheets: %s", sheet, e)
+            self._seeded.add(sheet)
+
+    def headers(self, sheet):
+        self._seed(sheet)
+        return self.local.headers(sheet)
+
+    def read(self, sheet, columns=None, rows=None):
+        self._seed(sheet)
+        return self.local.read(sheet, columns, rows)
+
+    def version(self, sheet):
+        self._seed(sheet)
+        return self.local.version(sheet)
+
+    def query(self, sheet, **kwargs):
+        self._seed(sheet)
+        return self.local.query(sheet, **kwargs)
+
+    def distinct(self, sheet, column):
+        self._seed(sheet)
+        return self.local.distinct(sheet, column)
+
+    def append(self, sheet, rows):
+        self._seed(sheet)
+        ids = self.local.append(sheet, rows)
+        try:
+            self.writer.append(sheet, rows, keys=[str(i) for i in ids])
+        except Exception as e:
+            log.warning("Sheets mirror append to %s failed: %s", sheet, e)
+        return ids
+
+    def update(self, sheet, changes):
+        self._seed(sheet)
+        self.local.update(sheet, changes)
+        try:
+            self.writer.update(sheet, changes)
+        except Exception as e:
+            log.warning("Sheets mirror update on %s failed: %s", sheet, e)
+
+    def delete(self, sheet, ids):
+        # Local only: the Sheets copy keeps the full history and its row numbers
+        self._seed(sheet)
+        self.local.delete(sheet, ids)
+
+
+class JournaledStore:
+    """Sheets-only backend whose writes go through the journal.
+
+    Reads show queued rows that have not reached Sheets yet, so a farmer sees
+    their booking straight away.
+    """
+
+    def __init__(self, store, journal):
+        self.store = store
+        self.journal = journal
+
+    def headers(self, sheet):
+        return self.store.headers(sheet)
+
+    def version(self, sheet):
+        return self.store.version(sheet), self.journal.last_seq(sheet)
+
+    def read(self, sheet, columns=None, rows=None):
+        df = self.store.read(sheet, columns, rows)
+        edits = self.journal.pending_updates(sheet)
+        if edits:
+            df = df.copy()
+            for row_id, values in edits.items():
+                for col, value in values.items():
+                    if row_id in df.index and col in df.columns:
+                        df.at[row_id, col] = value
+        # Queued rows have no sheet row yet, so only unranged reads can show them
+        queued = self.journal.pending_rows(sheet) if rows is None else []
+        if not queued:
+            return df
+        start = (df.index.max() if len(df) else 0) + 1
+        extra = pd.DataFrame(queued, index=pd.RangeIndex(start, start + len(queued)))
+        if columns is not None:
+            extra = extra.reindex(columns=df.columns, fill_value="")
+        return pd.concat([df, extra]) if len(df) else extra
+
+    def append(self, sheet, rows):
+        return self.journal.append(sheet, rows)
+
+    def update(self, sheet, changes):
+        self.journal.update(sheet, changes)
+
+
+# =========================================================
+# READ CACHE
+# =========================================================
+
+class CachedStore:
+    """Keeps the last DataFrame per sheet so reruns don't rebuild it.
+
+    The cached frame is reused while store.version(sheet) is unchanged and it is
+    younger than ttl. Our own writes patch the cached frame (appended rows,
+    updated cells) instead of forcing a re-read; appended rows are held back
+    and added in one go by the next read, so a run of bookings with no reads
+    in between costs no frame work. Callers must treat returned frames as
+    read-only; they are shared between sessions.
+
+    schema(sheet, df) types each frame once as it enters the cache (see
+    schema.apply); query()/distinct() keep returning the backend's raw values.
+    On backends without SQL they run over an untyped copy of the sheet, cached
+    by version like the typed one.
+
+    Projected reads (columns=/rows=) are cached per projection, up to
+    max_projections of them. They are cut from the full frame when that is
+    cached and fresh, otherwise fetched from the backend on their own, and
+    dropped on any write to the sheet. hits / misses count cached reads.
+    """
+
+    def __init__(self, store, ttl=20, schema=None, max_projections=64):
+        self.store = store
+        self.ttl = ttl
+        self.schema = schema or (lambda sheet, df: df)
+        self.max_projections = max_projections
+        self.lock = threading.Lock()
+        self._frames = {}
+        self._appended = {}  # sheet -> [(row, id)] not yet in its cached frame
+        self._raw = {}
+        self._projections = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def headers(self, sheet):
+        return self.store.headers(sheet)
+
+    def version(self, sheet):
+        return self.store.version(sheet)
+
+    def query(self, sheet, **kwargs):
+        # Push filters/sort/paging down to SQL when the backend has it
+        if hasattr(self.store, "query"):
+            return self.store.query(sheet, **kwargs)
+        return query_frame(self._read_raw(sheet), **kwargs)
+
+    def distinct(self, sheet, column):
+        if hasattr(self.store, "distinct"):
+            return self.store.distinct(sheet, column)
+        return distinct_frame(self._read_raw(sheet), column)
+
+    def _read_raw(self, sheet):
+        version = self.store.version(sheet)
+        with self.lock:
+            entry = self._raw.get(sheet)
+            fresh = self._fresh(entry, version)
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if fresh:
+            return entry[0]
+        df = self.store.read(sheet)
+        with self.lock:
+            self._raw[sheet] = (df, version, time.monotonic())
+        return df
+
+    def invalidate(self, sheet=None):
+        with self.lock:
+            if sheet is None:
+                self._frames.clear()
+                self._appended.clear()
+                self._raw.clear()
+                self._projections.clear()
+            else:
+                self._frames.pop(sheet, None)
+                self._appended.pop(sheet, None)
+                self._raw.pop(sheet, None)
+                self._drop_projections(sheet)
+
+    def _drop_projections(self, sheet):
+        for key in [k for k in self._projections if k[0] == sheet]:
+            del self._projections[key]
+
+    def _frame(self, sheet):
+        # Call with the lock held: the cached entry with any held-back appends added
+        entry = self._frames.get(sheet)
+        pending = self._appended.pop(sheet, None)
+        if entry is not None and pending:
+            df = entry[0]
+            added = pd.DataFrame([row for row, _ in pending], index=pd.Index([i for _, i in pending]))
+            added = self.schema(sheet, added.reindex(columns=df.columns, fill_value=""))
+            entry = self._frames[sheet] = (extend_frame(df, added), entry[1], entry[2])
+        return entry
+
+    def _fresh(self, entry, version):
+        return entry is not None and entry[1] == version and time.monotonic() - entry[2] < self.ttl
+
+    def read(self, sheet, columns=None, rows=None):
+        if columns is not None or rows is not None:
+            return self._read_projection(sheet, columns, rows)
+        version = self.store.version(sheet)
+        with self.lock:
+            entry = self._frames.get(sheet)
+            fresh = self._fresh(entry, version)
+            if fresh:
+                entry = self._frame(sheet)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if fresh:
+            return entry[0]
+        df = self.schema(sheet, self.store.read(sheet))
+        with self.lock:
+            self._frames[sheet] = (df, self.store.version(sheet), time.monotonic())
+            self._appended.pop(sheet, None)
+        return df
+
+    def _read_projection(self, sheet, columns, rows):
+        key = (
+            sheet,
+            None if columns is None else tuple(columns),
+            None if rows is None else tuple((int(a), int(b)) for a, b in rows),
+        )
+        version = self.store.version(sheet)
+        with self.lock:
+            entry = self._projections.get(key)
+            if self._fresh(entry, version):
+                self._projections.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            full = self._frames.get(sheet)
+            if self._fresh(full, version):
+                full = self._frame(sheet)
+        if self._fresh(full, version):
+            df = project_frame(full[0], columns, rows)
+        else:
+            df = self.schema(sheet, self.store.read(sheet, columns=columns, rows=rows))
+        with self.lock:
+            self._projections[key] = (df, version, time.monotonic())
+            while len(self._projections) > self.max_projections:
+                self._projections.popitem(last=False)
+        return df
+
+    def append(self, sheet, rows):
+        ids = self.store.append(sheet, rows)
+        with self.lock:
+            self._drop_projections(sheet)
+            self._raw.pop(sheet, None)
+            entry = self._frames.pop(sheet, None)
+            # A frame past its ttl is re-read by the next read anyway
+            keep = entry and time.monotonic() - entry[2] < self.ttl and len(entry[0].columns)
+            if keep and ids and len(ids) == len(rows):
+                self._appended.setdefault(sheet, []).extend(zip(rows, ids))
+                self._frames[sheet] = (entry[0], self.store.version(sheet), entry[2])
+            else:
+                self._appended.pop(sheet, None)
+        return ids
+
+    def delete(self, sheet, ids):
+        self.store.delete(sheet, ids)
+        self.invalidate(sheet)
+
+    def update(self, sheet, changes):
+        self.store.update(sheet, changes)
+        with self.lock:
+            self._drop_projections(sheet)
+            self._raw.pop(sheet, None)
+            entry = self._frame(sheet)
+            self._frames.pop(sheet, None)
+            if entry:
+                touched = {col for values in changes.values() for col in values if col in entry[0].columns}
+                # object first, so a new category or a date string can be written in place
+                df = entry[0].astype({col: object for col in touched})
+                for row_id, values in changes.items():
+                    for col, value in values.items():
+                        if row_id in df.index and col in df.columns:
+                            df.at[row_id, col] = value
+                self._frames[sheet] = (self.schema(sheet, df), self.store.version(sheet), entry[2])
+
+
+# =========================================================
+# KEY INDEX (LOGIN LOOKUPS)
+# =========================================================
+
+def normalize_key(value):
+    text = str(value).strip()
+    if text.endswith(".0") and text[:-2].isdigit():
+        text = text[:-2]  # numbers that came back from Sheets as floats
+    return text
+
+
+def normalize_mobile(value):
+    digits = "".join(ch for ch in normalize_key(value) if ch.isdigit())
+    return digits[-10:]  # drop +91 / leading 0
+
+
+class KeyIndex:
+    """Hash index from a normalized key column (Mobile, Corp_ID) to the row record.
+
+    Lookups are a dict hit. The index is rebuilt only when store.version(sheet)
+    changes, i.e. after a write to that sheet. It is built from query() rather
+    than read(), because cached frames drop the Password column.
+    """
+
+    def __init__(self, store, sheet, column, normalize=normalize_key):
+        self.store = store
+        self.sheet = sheet
+        self.column = column
+        self.normalize = normalize
+        self.lock = threading.Lock()
+        self._version = object()
+        self._map = {}
+
+    def _refresh(self):
+        version = self.store.version(self.sheet)
+        if version == self._version:
+            return
+        try:
+            df, _ = self.store.query(self.sheet)
+        except Exception as e:
+            if not self._map:
+                raise
+            # Keep answering logins from the last good index while the backend is unavailable
+            log.warning("Could not refresh %s index, using the previous one: %s", self.sheet, e)
+            return
+        index = {}
+        if self.column in df.columns:
+            for row_id, record in zip(df.index, df.to_dict("records")):
+                record[ROW_ID] = row_id
+                index.setdefault(self.normalize(record[self.column]), record)
+        self._map, self._version = index, version
+
+    def get(self, key):
+        key = self.normalize(key)
+        if not key:
+            return None
+        with self.lock:
+            self._refresh()
+            return self._map.get(key)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+def open_store(settings, sheets_client=None, roll_archive=True, journal_name=None):
+    """Build the store described by the app settings (st.secrets or a plain dict).
+
+    STORAGE_BACKEND  "sqlite" (default) or "sheets"
+    SQLITE_PATH      local database file, default kisaangrow.db
+    SHEET_ID         Google Sheet to mirror to (or to use directly with "sheets")
+    SHEETS_MIRROR    set false to keep the SQLite store fully local
+    JOURNAL_PATH     write-ahead journal for Sheets writes, default kisaangrow.journal
+    CACHE_TTL        seconds a cached sheet DataFrame may be reused (and between Sheets remote-edit checks), default 20
+    ROLLUP_PATH      SQLite file for the KPI rollups, default SQLITE_PATH
+    SHEETS_FULL_RESYNC  seconds between full re-downloads in delta sync, default 600
+    SHEETS_RATE_PER_MIN / SHEETS_BURST / SHEETS_RETRIES  Sheets API scheduler limits, default 60 / 10 / 5
+    ARCHIVE_DIR / ARCHIVE_PARTITION / SEASON_START_MONTH / ARCHIVE_KEEP  see archive.open_archive
+
+    Unless roll_archive is false, past partitions of Slots are archived on open
+    (SQLite backends only). A journal is locked to one process, so tools running
+    beside the app pass journal_name and get their own: JOURNAL_PATH with
+    "-<journal_name>" before the extension (kisaangrow-api.journal).
+    """
+    store = CachedStore(
+        _open_backend(settings, sheets_client, journal_name), ttl=float(settings.get("CACHE_TTL", 20)), schema=schema.apply
+    )
+    slot_archive = open_archive(settings)
+    if roll_archive and settings.get("STORAGE_BACKEND", "sqlite") != "sheets":
+        try:
+            slot_archive.roll(store)
+        except Exception as e:
+            log.warning("Could not archive old bookings: %s", e)
+    rollup = SlotRollup(settings.get("ROLLUP_PATH", settings.get("SQLITE_PATH", "kisaangrow.db")))
+    if rollup.is_empty():
+        try:
+            rollup.rebuild(pd.concat([slot_archive.read_all(), store.read("Slots")]))
+        except Exception as e:
+            log.warning("Could not build KPI rollups: %s", e)
+    return RollupStore(store, rollup)
+
+
+def sheets_client(settings):
+    """gspread client for command-line tools, or None when no Sheet is configured."""
+    if not settings.get("SHEET_ID"):
+        return None
+    if settings.get("STORAGE_BACKEND") != "sheets" and not settings.get("SHEETS_MIRROR", True):
+        return None
+    import gspread
+    from google.oauth2.service_account import Credentials
+    scopes = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+    info = settings["GCP_SERVICE_ACCOUNT"]
+    creds = Credentials.from_service_account_info(json.loads(info) if isinstance(info, str) else info, scopes=scopes)
+    return gspread.authorize(creds)
+
+
+def _open_backend(settings, sheets_client, journal_name=None):
+    backend = settings.get("STORAGE_BACKEND", "sqlite")
+    sheets = None
+    if sheets_client is not None and settings.get("SHEET_ID"):
+        sheets = SheetsStore(
+            sheets_client, settings["SHEET_ID"], full_every=settings.get("SHEETS_FULL_RESYNC", 600),
+            ttl=float(settings.get("CACHE_TTL", 20)), scheduler=open_scheduler(settings), keyed=backend != "sheets",
+        )
+    if backend == "sheets":
+        if sheets is None:
+            raise ValueError('STORAGE_BACKEND = "sheets" needs SHEET_ID and GCP_SERVICE_ACCOUNT')
+        return JournaledStore(sheets, _start_journal(settings, sheets, journal_name))
+    local = SQLiteStore(settings.get("SQLITE_PATH", "kisaangrow.db"))
+    if sheets is None or not settings.get("SHEETS_MIRROR", True):
+        return local
+    return MirroredStore(local, sheets, _start_journal(settings, sheets, journal_name))
+
+
+# One journal per path and process: reopening the store (st.cache_resource.clear,
+# bench cold runs) reuses the running journal instead of tripping over its lock
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def _start_journal(settings, sheets, journal_name=None):
+    path = settings.get("JOURNAL_PATH", "kisaangrow.journal")
+    if journal_name:
+        root, ext = os.path.splitext(path)
+        path = f"{root}-{journal_name}{ext}"
+    with _journals_lock:
+        journal = _journals.get(os.path.abspath(path))
+        if journal is None:
+            journal = _journals[os.path.abspath(path)] = WriteJournal(path, sheets).start()
+            atexit.register(journal.close)
+    return journal
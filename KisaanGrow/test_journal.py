@@ -0,0 +1,121 @@
+# KisaanGrow journal tests — crash replay, failed appends and compaction against fakes.FakeClient
+#
+#     cd KisaanGrow && python -m pytest -q test_journal.py
+#
+# A "crash" closes the journal's files without the final flush close() would do,
+# leaving the journal and checkpoint on disk exactly as a killed process would.
+
+import pytest
+
+import fakes
+import journal
+import storage
+
+HEADER = ["Farmer_Mobile", "Quantity"]
+
+
+class Killed(BaseException):
+    pass
+
+
+def _rows(n, start=0):
+    return [{"Farmer_Mobile": f"98{i:08d}", "Quantity": i % 10 + 1} for i in range(start, start + n)]
+
+
+def _sink(client):
+    return storage.SheetsStore(client, "local")
+
+
+def _sheet_rows(client):
+    rows = client.spreadsheet.worksheets["Slots"].rows
+    col = rows[0].index(storage.WRITE_ID)
+    return rows[1:], [r[col] for r in rows[1:]]
+
+
+def _crash(j):
+    j.fh.close()
+    j._lock_fh.close()
+
+
+@pytest.fixture
+def client():
+    return fakes.FakeClient(sheets={"Slots": [HEADER]})
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "test.journal")
+
+
+def test_crash_before_checkpoint_replays_without_duplicates(client, path, monkeypatch):
+    j = journal.WriteJournal(path, _sink(client))
+    j.append("Slots", _rows(5))
+
+    def killed(*args):
+        raise Killed  # process dies after Sheets applied the rows, before the checkpoint
+
+    monkeypatch.setattr(journal, "_fsync_write", killed)
+    with pytest.raises(Killed):
+        j.flush()
+    _crash(j)
+    monkeypatch.undo()
+
+    assert len(_sheet_rows(client)[0]) == 5
+    j = journal.WriteJournal(path, _sink(client))
+    assert j.backlog() == 5 and len(j.unsure) == 5
+    assert j.flush() == 5
+    rows, keys = _sheet_rows(client)
+    assert len(rows) == 5 and len(set(keys)) == 5
+    assert j.backlog() == 0 and not j.unsure
+    j.close()
+
+
+def test_failed_append_rows_is_retried_without_duplicates(client, path, monkeypatch):
+    ws = client.spreadsheet.worksheets["Slots"]
+    applied = ws.append_rows
+
+    def timed_out(values, **kwargs):
+        applied(values, **kwargs)
+        raise TimeoutError("read timed out")  # Sheets applied it, we never heard back
+
+    j = journal.WriteJournal(path, _sink(client))
+    j.append("Slots", _rows(3))
+    monkeypatch.setattr(ws, "append_rows", timed_out)
+    with pytest.raises(TimeoutError):
+        j.flush()
+    assert j.backlog() == 3 and len(j.unsure) == 3
+
+    monkeypatch.undo()
+    j.append("Slots", _rows(2, start=3))
+    assert j.flush() == 5
+    rows, keys = _sheet_rows(client)
+    assert len(rows) == 5 and len(set(keys)) == 5
+    assert [r[0] for r in rows] == [r["Farmer_Mobile"] for r in _rows(5)]
+    j.close()
+
+
+def test_recovery_after_compaction(client, path, monkeypatch):
+    monkeypatch.setattr(journal, "COMPACT_BYTES", 0)
+    j = journal.WriteJournal(path, _sink(client))
+    j.append("Slots", _rows(4))
+    j.flush()
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == ""  # every entry was checkpointed, so the file was truncated
+    j.append("Slots", _rows(3, start=4))
+    j.update("Slots", {2: {"Quantity": 99}})
+    _crash(j)
+
+    j = journal.WriteJournal(path, _sink(client))
+    assert j.backlog() == 4 and j.seq == 8
+    assert [e["seq"] for e in j.pending] == [5, 6, 7, 8]
+    j.append("Slots", _rows(1, start=7))
+    assert j.pending[-1]["seq"] == 9  # seqs keep counting past the checkpoint, none reused
+    assert j.flush() == 5
+    rows, keys = _sheet_rows(client)
+    assert len(rows) == 8 and len(set(keys)) == 8
+    assert rows[1][1] == "99"
+    j.close()
+
+    j = journal.WriteJournal(path, _sink(client))
+    assert j.backlog() == 0
+    j.close()
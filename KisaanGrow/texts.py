@@ -0,0 +1,87 @@
+# KisaanGrow static UI text — translations and page CSS
+#
+# Kept out of KisanGrowApp.py so the dictionaries are built once per process
+# instead of on every script rerun; the app only looks keys up.
+
+LANGUAGES = {"en": "English", "hi": "हिन्दी"}
+
+TEXT = {
+    "title": {"en": "Welcome to KisaanGrow", "hi": "किसानग्रो में आपका स्वागत है"},
+    "subtitle": {"en": "Smart slot booking. AI guidance. Simple payments.", "hi": "स्मार्ट स्लॉट बुकिंग, AI सलाह और आसान भुगतान."},
+    "home_line1": {
+        "en": "KisaanGrow helps farmers book sugarcane delivery slots easily and avoid long waiting hours.",
+        "hi": "किसानग्रो किसानों को गन्ने की डिलीवरी स्लॉट आसानी से बुक करने और लंबे इंतज़ार से बचने में मदद करता है।"
+    },
+    "home_line2": {
+        "en": "Get instant AI guidance and track your payments in one place.",
+        "hi": "तुरंत AI सलाह प्राप्त करें और अपने भुगतान एक ही जगह ट्रैक करें।"
+    },
+
+    # Login Cards
+    "farmer_login": {"en": "Farmer Login", "hi": "किसान लॉगिन"},
+    "corporate_login": {"en": "Corporate Login", "hi": "कॉपोरेट लॉगिन"},
+    "mobile": {"en": "Mobile Number", "hi": "मोबाइल नंबर"},
+    "password": {"en": "Password", "hi": "पासवर्ड"},
+    "login_btn": {"en": "Login", "hi": "लॉगिन करें"},
+    "login_success": {"en": "Login successful", "hi": "लॉगिन सफल"},
+    "login_error": {"en": "Invalid credentials", "hi": "गलत जानकारी"},
+    "service_unavailable": {"en": "Service unavailable, please try again in a minute.", "hi": "सेवा अभी उपलब्ध नहीं है, कृपया थोड़ी देर बाद फिर कोशिश करें।"},
+
+    # Farmer Dashboard
+    "farmer_dashboard": {"en": "Farmer Dashboard", "hi": "किसान डैशबोर्ड"},
+    "book_slot": {"en": "Book a Slot", "hi": "स्लॉट बुक करें"},
+    "quantity": {"en": "Sugarcane quantity (tonnes)", "hi": "गन्ने की मात्रा (टन में)"},
+    "choose_date": {"en": "Choose slot date", "hi": "स्लॉट की तारीख चुनें"},
+    "choose_time": {"en": "Select time slot", "hi": "समय का स्लॉट चुनें"},
+    "book_btn": {"en": "Book Slot", "hi": "स्लॉट बुक करें"},
+    "slot_booked": {"en": "Slot booked!", "hi": "स्लॉट बुक हो गया!"},
+    "slot_full": {"en": "This slot is full. Nearest free slots:", "hi": "यह स्लॉट भरा हुआ है। सबसे नज़दीकी खाली स्लॉट:"},
+    "slot_moved": {"en": "Your slot was full, booked instead:", "hi": "आपका स्लॉट भरा था, इसके बदले बुक किया गया:"},
+    "auto_redirect": {"en": "If full, book the nearest free slot", "hi": "भरा होने पर सबसे नज़दीकी खाली स्लॉट बुक करें"},
+    "tonnes_free": {"en": "t free", "hi": "टन खाली"},
+    "ai_tip": {"en": "AI Advice", "hi": "AI सलाह"},
+    "ai_fallback": {
+        "en": "Cut your sugarcane as close to your slot time as possible and keep it shaded, so it reaches the mill fresh and weighs well.",
+        "hi": "गन्ने की कटाई अपने स्लॉट के समय के जितना करीब हो सके करें और उसे छाया में रखें, ताकि वह ताज़ा मिल पहुँचे और उसका वज़न अच्छा रहे।"
+    },
+
+    # Corporate Dashboard
+    "corp_dashboard": {"en": "Corporate Dashboard", "hi": "कॉपोरेट डैशबोर्ड"},
+    "all_bookings": {"en": "All Bookings", "hi": "सभी बुकिंग"},
+    "no_slots": {"en": "No farmer bookings yet.", "hi": "अभी कोई किसान बुकिंग नहीं है."},
+
+    "farmer_reg": {"en": "Farmer Registration", "hi": "किसान पंजीकरण"},
+    "corp_reg": {"en": "Corporate Registration", "hi": "कॉपोरेट पंजीकरण"},
+    "full_name": {"en": "Full Name", "hi": "पूरा नाम"},
+    "aadhar": {"en": "Aadhar Number", "hi": "आधार नंबर"},
+    "village": {"en": "Village (optional)", "hi": "गाँव (ऐच्छिक)"},
+    "create_pwd": {"en": "Create Password", "hi": "पासवर्ड बनाएँ"},
+    "confirm_pwd": {"en": "Confirm Password", "hi": "पासवर्ड की पुष्टि करें"},
+    "reg_farmer_btn": {"en": "Register Farmer", "hi": "किसान पंजीकृत करें"},
+    "reg_success_farmer": {"en": "Farmer registered successfully!", "hi": "किसान सफलतापूर्वक पंजीकृत हो गया!"},
+    "emp_id": {"en": "Employee ID", "hi": "कर्मचारी आईडी"},
+    "role": {"en": "Role", "hi": "भूमिका"},
+    "reg_corp_btn": {"en": "Register Corporate User", "hi": "कॉपोरेट उपयोगकर्ता पंजीकृत करें"},
+    "reg_success_corp": {"en": "Corporate user registered successfully!", "hi": "कॉपोरेट उपयोगकर्ता सफलतापूर्वक पंजीकृत हुआ!"},
+    "slot_id": {"en": "Enter Slot ID to update payment", "hi": "भुगतान अपडेट करने के लिए स्लॉट आईडी दर्ज करें"},
+    "payment_status": {"en": "Payment status", "hi": "भुगतान स्थिति"},
+    "update_payment_btn": {"en": "Update Payment", "hi": "भुगतान अपडेट करें"},
+    "payment_updated": {"en": "Payment status updated", "hi": "भुगतान स्थिति अपडेट हो गई"},
+    "payment_failed": {"en": "Slot ID not found", "hi": "स्लॉट आईडी नहीं मिली"},
+    "already_registered": {"en": "This account is already registered. Please login.", "hi": "यह खाता पहले से पंजीकृत है। कृपया लॉगिन करें।"}
+}
+
+# Smooth UI transitions
+CSS = """
+<style>
+* {
+    transition: all 0.25s ease-in-out;
+}
+div[data-testid="stSidebar"] * {
+    transition: all 0.25s ease-in-out;
+}
+button, select, input, textarea {
+    transition: background-color 0.25s ease, color 0.25s ease, border 0.25s ease;
+}
+</style>
+"""